@@ -1,64 +1,251 @@
 import numpy as np
-import random as rnd
 import time
+import bisect
+import itertools
+import json
+import argparse
+from pheromones import PheromoneField, SparsePheromoneField
+from colony import Colony, Ant
+from food import FoodStore, Food
+import kernel
+import checkpoint
+import distance
+import placement
+import terminal
+from terrain import Terrain, load_terrain
+from metrics import Metrics
 
 movements = [[-1, -1], [-1, 0], [-1, 1], [0, -1], [0, 1], [1, -1], [1, 0], [1, 1]]
 
+# Increased whenever a change alters the results of seeded runs, so
+# cached results from earlier versions are not reused
+engine_version = 1
+
 class aco:
-    def __init__(self, dimensions, no_ants, no_food, carry_capacity=3, food_capacity=10, home_coors=None, pheromone_deposit=1000.0, evaporation_coefficient=0.02, alpha=10, beta=1, food_deplete=True, random_ant_colour=False, verbose=False):
-        self.ants = []
-        self.food = {}
+    def __init__(self, dimensions, no_ants, no_food, carry_capacity=3, food_capacity=10, home_coors=None, pheromone_deposit=1000.0, evaporation_coefficient=0.02, alpha=10, beta=1, food_deplete=True, random_ant_colour=False, engine='reference', pheromone_update=None, resolve_conflicts=False, pheromone_backend='dense', nests=None, home_metric=None, terrain=None, food_placement='uniform', placement_options=None, seed=None, debug=False, verbose=False):
+        # Constructor arguments, kept so checkpoints can rebuild the simulation
+        self.params = {key: value for key, value in locals().items() if key != 'self'}
+        if not isinstance(terrain, str):
+            # Terrain arrays are saved with checkpoints instead
+            self.params['terrain'] = None
         self.dimensions = dimensions
-        self.pheromones = np.full(dimensions, 1.0, dtype=float)
         if home_coors != None:  
             self.home_coors = home_coors
         else:
             self.home_coors = [int(dimensions[0]/2), int(dimensions[1]/2)]
+
+        # Ants are shared between the nests in turn, and bring food back
+        # to whichever nest they reach. home_coors is the first nest.
+        if nests == None:
+            nests = [self.home_coors]
+        self.nests = [list(nest) for nest in nests]
+        self.home_coors = self.nests[0]
         self.all_food = no_food*food_capacity
         self.brought_food = 0
-        self.evaporation_coefficient = 0.02
-        self.pheromone_deposit = 1000.0
+        # Food held by ants, kept up to date so is_finished needs no scan
+        self.carried_food = 0
+        self.steps = 0
+        self.recorder = None
+        self.metrics = None
+        self.evaporation_coefficient = evaporation_coefficient
+        self.pheromone_deposit = pheromone_deposit
         self.alpha = alpha
         self.beta = beta
         self.food_deplete = food_deplete
         self.random_ant_colour = random_ant_colour
+        self.debug = debug
+
+        # Every instance owns its generator, so runs with the same seed
+        # and parameters are identical. Unseeded runs still record the
+        # seed they were given so they can be replayed.
+        if seed == None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self.params['seed'] = seed
+        self.rng = np.random.default_rng(seed)
+
+        # 'reference' moves ants one at a time, each seeing the moves
+        # before it. 'vectorized' moves every ant at once from the state
+        # at the start of the tick.
+        if engine not in ['reference', 'vectorized']:
+            raise ValueError("engine must be 'reference' or 'vectorized'")
+        self.engine = engine
+        self.resolve_conflicts = resolve_conflicts
+
+        # 'ant' evaporates and deposits after every ant move, 'tick'
+        # only once after all ants have moved
+        if pheromone_update == None:
+            pheromone_update = 'ant' if engine == 'reference' else 'tick'
+        if pheromone_update not in ['ant', 'tick']:
+            raise ValueError("pheromone_update must be 'ant' or 'tick'")
+        if engine == 'vectorized' and pheromone_update != 'tick':
+            raise ValueError("the vectorized engine only supports pheromone_update='tick'")
+        self.pheromone_update = pheromone_update
+
+        # Walls and movement costs, given as a Terrain, an array of
+        # blocked cells or an image path
+        self.terrain = None
+        if terrain is not None:
+            self.terrain = load_terrain(terrain)
+            if self.terrain.dimensions != tuple(dimensions):
+                raise ValueError("terrain does not match the grid dimensions")
+            if self.terrain.blocked[tuple(np.array(self.nests).T)].any():
+                raise ValueError("nests cannot be on blocked cells")
+        # Homing goes around walls unless another metric is asked for
+        if home_metric == None:
+            home_metric = 'bfs' if self.terrain != None else 'manhattan'
+        self.home_metric = home_metric
+        # Food is only placed where ants from some nest can reach it,
+        # otherwise a run could never finish
+        if self.terrain == None:
+            reachable = np.ones(dimensions, dtype=bool)
+        else:
+            reachable = self.terrain.distance(self.nests, 'bfs') != distance.unreachable
+        open_cells = int(reachable.sum())
+
+        # 'dense' stores every cell, 'sparse' only cells above the floor,
+        # for very large grids with few trails
+        if pheromone_backend == 'dense':
+            self.pheromone_field = PheromoneField(dimensions, self.evaporation_coefficient, self.pheromone_deposit)
+        elif pheromone_backend == 'sparse':
+            self.pheromone_field = SparsePheromoneField(dimensions, self.evaporation_coefficient, self.pheromone_deposit)
+        else:
+            raise ValueError("pheromone_backend must be 'dense' or 'sparse'")
 
         if no_ants + no_food > dimensions[0]*dimensions[1]:
-            print("not enough cells")
-            exit()
+            raise ValueError("not enough cells for "+str(no_ants)+" ants and "+str(no_food)+" food")
+        if len(self.nests) + no_food > open_cells:
+            raise ValueError("not enough cells for "+str(len(self.nests))+" nests and "+str(no_food)+" food")
+
+        # Food can go on any reachable cell except the nests, see
+        # placement for the strategies
+        free = reachable.copy()
+        free[tuple(np.array(self.nests).T)] = False
+        food_coors = placement.place_food(food_placement, dimensions, no_food, self.rng, free, self.nests,
+                                          **(placement_options or {}))
+        self.food = FoodStore(dimensions, food_coors, food_capacity)
 
-        food_coors = [self.home_coors]
-        while len(food_coors) < (no_food + 1):
-            coors = [rnd.randint(0, dimensions[0]-1), rnd.randint(0, dimensions[1]-1)]
-            if coors not in food_coors:
-                self.food[str(coors[0])+","+str(coors[1])] = Food(coors, food_capacity)
-                food_coors.append(coors)
+        starts = np.array(self.nests)[np.arange(no_ants) % len(self.nests)]
+        self.ants = Colony(no_ants, starts, no_food, carry_capacity=carry_capacity, random_colour=self.random_ant_colour, rng=self.rng)
 
-        ant_coors = []
-        
-        ants_created = 0
-        while ants_created < no_ants:
-            coors = self.home_coors
-            self.ants.append(Ant(coors, carry_capacity=carry_capacity, random_colour=self.random_ant_colour))
-            ants_created += 1
+        # Occupancy grids are built once here, then kept up to date as
+        # ants move and food is collected. They are stored padded so the
+        # vectorized engine can gather neighbours without bounds checks.
+        # The food grids belong to the food store.
+        self.padded_ant_grid, self.ant_grid = kernel.padded(dimensions, int)
+        self.ant_grid[:], _ = self.get_object_grids()
+        self.padded_food_grid, self.food_grid = self.food.padded_grid, self.food.grid
+        self.padded_food_index, self.food_index = self.food.padded_index, self.food.index_grid
+        self.padded_home_grid, self.home_grid = kernel.padded(dimensions, bool)
+        self.padded_nest_index, self.nest_index = kernel.padded(dimensions, np.int32, fill=-1)
+        self.padded_home_distance, self.home_distance = kernel.padded(dimensions, np.int32, fill=distance.unreachable)
+        self.nest_food = np.zeros(len(self.nests), dtype=np.int64)
+        self.set_nests(self.nests, home_metric)
+
+    def set_nests(self, nests, metric=None):
+        """
+        Moves the nests, rebuilding the home grids and the distance to
+        the nearest nest. Ants already out stay where they are.
+        :param nests:  List of nest coordinates
+        :param metric: Distance metric, see distance.metrics. Defaults
+                       to the current metric.
+        """
+        if metric == None:
+            metric = self.home_metric
+        if self.terrain != None:
+            self.home_distance[:] = self.terrain.distance(nests, metric)
+        else:
+            self.home_distance[:] = distance.distance_field(self.dimensions, nests, metric)
+        self.home_metric = metric
 
-        self.ant_grid, self.food_grid = self.get_object_grids()
+        if len(nests) != len(self.nests):
+            self.nest_food = np.zeros(len(nests), dtype=np.int64)
+        self.nests = [list(nest) for nest in nests]
+        self.home_coors = self.nests[0]
+        self.home_grid[:] = False
+        self.nest_index[:] = -1
+        for index, (x, y) in enumerate(self.nests):
+            self.home_grid[x, y] = True
+            self.nest_index[x, y] = index
 
-    def start_aco(self):
+    def start_aco(self, delay=0.5, renderer=None):
         """
         Starts the ant colony optimisation, printing the grid
         to the console.
+        :param delay:    Seconds to wait between steps
+        :param renderer: terminal.TerminalRenderer to draw with instead
+                         of printing the whole grid every step
         """
-        self.print_grid()
-        while(True):
+        if renderer == None:
+            self.print_grid()
+            while(True):
+
+                if self.is_finished():
+                    break
+                self.increment()
+                self.print_grid()
+                time.sleep(delay)
+
+            print("Simulation ended.")
+            return
 
-            if self.is_finished():
+        try:
+            renderer.draw(self, force=True)
+            while not self.is_finished():
+                renderer.handle_keys()
+                self.increment()
+                renderer.draw(self)
+                if delay > 0:
+                    time.sleep(delay)
+            renderer.draw(self, force=True)
+        finally:
+            renderer.close()
+        print("Simulation ended.")
+
+    def run(self, max_steps=None, until_finished=True, checkpoint_path=None, checkpoint_every=None):
+        """
+        Runs the simulation without printing or sleeping.
+        :param max_steps:        Maximum number of steps, or None for no limit
+        :param until_finished:   Stops early once all food is collected
+        :param checkpoint_path:  File to save checkpoints to
+        :param checkpoint_every: Saves a checkpoint every this many steps
+        :return RunResult:       Summary of the run
+        """
+        if max_steps == None and not until_finished:
+            raise ValueError("run needs max_steps when until_finished is False")
+        if checkpoint_every != None and checkpoint_path == None:
+            raise ValueError("run needs checkpoint_path when checkpoint_every is given")
+
+        steps = 0
+        start = time.perf_counter()
+        while max_steps == None or steps < max_steps:
+            if until_finished and self.is_finished():
                 break
             self.increment()
-            self.print_grid()
-            time.sleep(0.5)
+            steps += 1
+            if checkpoint_every != None and self.steps % checkpoint_every == 0:
+                self.save(checkpoint_path)
+        elapsed = time.perf_counter() - start
 
-        print("Simulation ended.")
+        result = RunResult(steps, len(self.ants), self.brought_food, self.food_left(), self.is_finished(), elapsed, self.seed)
+        if self.metrics != None:
+            result.metrics = self.metrics.summary()
+        return result
+
+    def enable_metrics(self, callback=None):
+        """
+        Turns on per-phase timers and event counters.
+        :param callback:  Called with the Metrics object after every step
+        :return Metrics:  Metrics object that is updated as the simulation runs
+        """
+        self.metrics = Metrics(callback)
+        return self.metrics
+
+    def disable_metrics(self):
+        """
+        Turns off metrics collection.
+        """
+        self.metrics = None
 
     def increment(self):
         """
@@ -66,57 +253,301 @@ class aco:
         :return int: Total food left
         """
         self.move_ants()
-        self.ant_grid, self.food_grid = self.get_object_grids()
-        total_food = 0
-
-        for key in self.food.keys():
-            total_food += self.food[key].food_val
-        
-        return total_food
-        
+        self.steps += 1
+        if self.debug:
+            self.check_object_grids()
+        if self.recorder != None:
+            self.recorder.record(self)
+        if self.metrics != None:
+            self.metrics.end_step()
+
+        return self.food_left()
+
+    def save(self, path):
+        """
+        Saves the full simulation state to a checkpoint file.
+        :param path: Checkpoint file path
+        """
+        ants = self.ants
+        food = self.food
+        state = {
+            'params': self.params,
+            'steps': self.steps,
+            'brought_food': self.brought_food,
+            'rng': self.rng.bit_generator.state,
+            'nests': self.nests,
+            'home_metric': self.home_metric,
+            'colours': ants.colours,
+            'taboo_cooldown': ants.taboo_cooldown
+        }
+        arrays = dict(self.pheromone_field.state())
+        arrays.update({
+            'nest_food': self.nest_food,
+            'ant_locations': ants.locations,
+            'ant_carry': ants.carry,
+            'ant_capacity': ants.capacity,
+            'ant_colour_index': ants.colour_index,
+            'ant_taboo': ants.taboo,
+            'food_locations': food.locations,
+            'food_val': food.values,
+            'food_capacity': food.capacity,
+            'food_active': food.active
+        })
+        if self.terrain != None:
+            arrays['terrain_blocked'] = self.terrain.blocked
+            arrays['terrain_cost'] = self.terrain.cost
+        checkpoint.write_checkpoint(path, state, arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Creates a simulation from a checkpoint file.
+        :param path: Checkpoint file path
+        :param mmap: Memory-maps large arrays instead of reading them
+        :return aco: Restored simulation
+        """
+        state, arrays = checkpoint.read_checkpoint(path, mmap)
+        params = dict(state['params'])
+        params['dimensions'] = tuple(params['dimensions'])
+        if 'terrain_blocked' in arrays:
+            params['terrain'] = Terrain(arrays['terrain_blocked'], arrays['terrain_cost'])
+
+        simulation = cls(**params)
+        simulation.restore(state, arrays)
+        return simulation
+
+    def restore(self, state, arrays):
+        """
+        Replaces the simulation state with state read from a checkpoint.
+        :param state:  Scalar state
+        :param arrays: Dictionary of name to NumPy array
+        """
+        self.steps = state['steps']
+        self.brought_food = state['brought_food']
+        self.rng.bit_generator.state = state['rng']
+        if state['nests'] != self.nests or state['home_metric'] != self.home_metric:
+            self.set_nests(state['nests'], state['home_metric'])
+        self.nest_food = np.array(arrays['nest_food'])
+        self.pheromone_field.restore(arrays)
+
+        # Memory-mapped arrays are used in place, copy-on-write
+        ants = self.ants
+        ants.locations = np.asarray(arrays['ant_locations'])
+        ants.carry = np.asarray(arrays['ant_carry'])
+        self.carried_food = int(ants.carry.sum())
+        ants.capacity = np.asarray(arrays['ant_capacity'])
+        ants.colour_index = np.asarray(arrays['ant_colour_index'])
+        ants.taboo = np.asarray(arrays['ant_taboo'])
+        ants.colours = state['colours']
+        ants.taboo_cooldown = state['taboo_cooldown']
+
+        food = self.food
+        food.locations[:] = arrays['food_locations']
+        food.values[:] = arrays['food_val']
+        food.capacity[:] = arrays['food_capacity']
+        food.active[:] = arrays['food_active']
+        food.rebuild()
+
+        self.ant_grid[:], _ = self.get_object_grids()
+
+    def food_left(self):
+        """
+        Sums the food left in every food source.
+        :return int: Total food left
+        """
+        return self.food.total
+
     def is_finished(self):
         """
         Checks if all food is collected.
         :return bool: If all food is collected
         """
-        carried_food = 0
-        for ant in self.ants:
-            carried_food += ant.current_carry
-
-        return (self.all_food == self.brought_food) or (carried_food == 0 and len(self.food.keys()) == 0)
+        return (self.all_food == self.brought_food) or (self.carried_food == 0 and len(self.food) == 0)
 
     def move_ants(self):
         """
         Moves all ants according to movement probabilities.
         """
-        for ant in self.ants:
-            for key in ant.taboo.keys():
-                if ant.taboo[key] >= 1:
-                    ant.taboo[key] -= 1
-            mov_probs = self.get_movement_probs(ant)
+        if self.engine == 'vectorized':
+            self.move_ants_batched()
+            return
+
+        ants = self.ants
+        locations, carry = ants.locations, ants.carry
+        metrics = self.metrics
+        if metrics != None:
+            metrics.start()
+        ants.cool_taboo()
+
+        for i in range(len(ants)):
+            mov_probs = self.get_movement_probs(ants[i])
+            if metrics != None:
+                metrics.lap('movement')
 
             if sum(mov_probs) != 0:
-                movement = rnd.choices(movements, weights=mov_probs, k=1)[0]
-                x, y = ant.location[0]+movement[0], ant.location[1]+movement[1]
-                ant.location = [x, y]
+                movement = self.choose_movement(mov_probs)
+                if metrics != None:
+                    metrics.lap('sampling')
+                    metrics.count('moves')
+                old_x, old_y = locations[i].tolist()
+                x, y = old_x+movement[0], old_y+movement[1]
+                self.ant_grid[old_x][old_y] -= 1
+                self.ant_grid[x][y] += 1
+                locations[i] = x, y
+                if metrics != None:
+                    metrics.lap('grids')
                 if self.food_grid[x][y] > 0:
-                    taboo_key = str(x)+","+str(y)
-                    ant.taboo[str(x)+","+str(y)] = ant.taboo_cooldown
-                    ant.current_carry += 1
-                    if self.food[taboo_key].food_val > 1:
-                        if self.food_deplete:
-                            self.food[taboo_key].food_val -= 1
-                    else: 
-                        #self.food[taboo_key].food_val = 0
-                        _ = self.food.pop(taboo_key)
-                elif ant.location == self.home_coors:
-                    self.brought_food += ant.current_carry
-                    ant.current_carry = 0
-                
-            self.ant_grid, self.food_grid = self.get_object_grids()
+                    food_index = self.food.at(x, y)
+                    ants.taboo[i][food_index] = ants.taboo_cooldown
+                    carry[i] += 1
+                    self.carried_food += 1
+                    self.food.take(food_index, self.food_deplete)
+                    if metrics != None:
+                        metrics.count('pickups')
+                elif self.home_grid[x][y]:
+                    if metrics != None and carry[i] > 0:
+                        metrics.count('deliveries')
+                    self.brought_food += int(carry[i])
+                    self.carried_food -= int(carry[i])
+                    self.nest_food[self.nest_index[x][y]] += carry[i]
+                    carry[i] = 0
+                if metrics != None:
+                    metrics.lap('food')
+            elif metrics != None:
+                metrics.count('blocked')
+
+            if self.pheromone_update == 'ant':
+                self.update_pheromones()
+                if metrics != None:
+                    metrics.lap('pheromones')
+
+        if self.pheromone_update == 'tick':
             self.update_pheromones()
+            if metrics != None:
+                metrics.lap('pheromones')
+
+    def choose_movement(self, mov_probs):
+        """
+        Picks a movement with probability proportional to its weight,
+        using the simulation's own generator.
+        :param mov_probs: Movement weights
+        :return [int]:    Chosen movement
+        """
+        cum_weights = list(itertools.accumulate(mov_probs))
+        choice = bisect.bisect(cum_weights, self.rng.random()*cum_weights[-1], 0, len(cum_weights)-1)
+        return movements[choice]
+
+    def move_ants_batched(self):
+        """
+        Moves every ant at once using the vectorized movement kernel.
+        All ants choose their moves from the state at the start of the
+        tick, then pickups and drop-offs are applied in ant order.
+        """
+        ants = self.ants
+        locations, carry = ants.locations, ants.carry
+        metrics = self.metrics
+        if metrics != None:
+            metrics.start()
+        ants.cool_taboo()
+
+        weights, xs, ys = self.get_movement_weights()
+        if metrics != None:
+            metrics.lap('movement')
+        choices, moving = kernel.sample_moves(weights, self.rng)
+        rows = np.arange(len(ants))
+        new_xs, new_ys = xs[rows, choices], ys[rows, choices]
+
+        if self.resolve_conflicts:
+            # Ants can already share food and home cells
+            shared = (self.food_grid[new_xs, new_ys] > 0) | self.home_grid[new_xs, new_ys]
+            kernel.resolve_conflicts(new_xs*self.dimensions[1]+new_ys, moving, shared)
+
+        movers = np.flatnonzero(moving)
+        if metrics != None:
+            metrics.lap('sampling')
+            metrics.count('moves', len(movers))
+            metrics.count('blocked', len(ants)-len(movers))
+        new_xs, new_ys = new_xs[movers], new_ys[movers]
+        np.subtract.at(self.ant_grid, (locations[movers, 0], locations[movers, 1]), 1)
+        np.add.at(self.ant_grid, (new_xs, new_ys), 1)
+        locations[movers, 0] = new_xs
+        locations[movers, 1] = new_ys
+        if metrics != None:
+            metrics.lap('grids')
+
+        # Several ants can reach the same food in one tick, so pickups
+        # are applied one at a time
+        on_food = self.food_grid[new_xs, new_ys] > 0
+        for i, x, y in zip(movers[on_food].tolist(), new_xs[on_food].tolist(), new_ys[on_food].tolist()):
+            food_index = self.food.at(x, y)
+            if food_index < 0:
+                continue
+            ants.taboo[i][food_index] = ants.taboo_cooldown
+            carry[i] += 1
+            self.carried_food += 1
+            if metrics != None:
+                metrics.count('pickups')
+            self.food.take(food_index, self.food_deplete)
+
+        at_home = movers[self.home_grid[new_xs, new_ys] & ~on_food]
+        if metrics != None:
+            metrics.count('deliveries', int((carry[at_home] > 0).sum()))
+        delivered = int(carry[at_home].sum())
+        self.brought_food += delivered
+        self.carried_food -= delivered
+        np.add.at(self.nest_food, self.nest_index[locations[at_home, 0], locations[at_home, 1]], carry[at_home])
+        carry[at_home] = 0
+        if metrics != None:
+            metrics.lap('food')
+
+        self.update_pheromones()
+        if metrics != None:
+            metrics.lap('pheromones')
+
+    def get_movement_weights(self):
+        """
+        Finds movement weights for every ant at once, matching
+        get_movement_probs for each ant.
+        :return np.array: (ants, 8) movement weights
+        :return np.array: (ants, 8) neighbour x coordinates
+        :return np.array: (ants, 8) neighbour y coordinates
+        """
+        ants = self.ants
+        xs, ys = kernel.neighbours(ants.locations)
+        px, py = xs+1, ys+1
+
+        food_index = self.padded_food_index[px, py]
+        if ants.taboo.shape[1] > 0:
+            rows = np.arange(len(ants))[:, None]
+            taboo = (ants.taboo[rows, np.maximum(food_index, 0)] > 0) & (food_index >= 0)
+        else:
+            taboo = np.zeros(xs.shape, dtype=bool)
+        if self.metrics != None:
+            self.metrics.count('taboo_hits', int(taboo.sum()))
+
+        centre = self.home_distance[ants.locations[:, 0], ants.locations[:, 1]]
+        homing = ants.full() | (len(self.food) == 0)
+
+        weights = kernel.movement_weights(ants.carry, ants.capacity,
+                                          self.pheromone_field.gather(xs, ys),
+                                          self.padded_food_grid[px, py],
+                                          self.padded_ant_grid[px, py] > 0,
+                                          self.padded_home_grid[px, py],
+                                          taboo, self.padded_home_distance[px, py] <= centre[:, None], homing)
+        if self.terrain != None:
+            kernel.apply_terrain(weights, self.terrain.mask(ants.locations[:, 0], ants.locations[:, 1]),
+                                 self.terrain.padded_cost[px, py])
+        return weights, xs, ys
+
+    @property
+    def pheromones(self):
+        """
+        Current pheromone values. This is the live array for the dense
+        backend, and a copy for the sparse backend.
+        :return np.array: Numpy array of pheromone values
+        """
+        return self.pheromone_field.values
 
-    
     def get_movement_probs(self, ant):
         """
         Finds an ant's movement probabilities for the 8 adjacent tiles.
@@ -124,6 +555,7 @@ class aco:
         :return [float]: Movement probabilties
         """
         centre = ant.location
+        carry, capacity = ant.current_carry, ant.carry_capacity
         mov_weights = []
         food_present = False
         going_home = False
@@ -139,42 +571,44 @@ class aco:
                         
                         # If adjacent to home, and carrying food, will always
                         # go to home. If not carrying food, probability = 0
-                        elif [centre[0]+i, centre[1]+j] == self.home_coors:
-                            if ant.current_carry > 0:
+                        elif self.home_grid[centre[0]+i][centre[1]+j]:
+                            if carry > 0:
                                 mov_weights = [0]*len(mov_weights)
                                 mov_weights.append(1.0)
                                 while len(mov_weights) < 8:
                                     mov_weights.append(0)
-                                return mov_weights
+                                return self.apply_terrain(centre, mov_weights)
                             else:
                                 mov_weights.append(0)
                         
                         # Probability of moving to food is 1.0, if
                         # food present, all other movement weights = 0
                         elif self.food_grid[centre[0]+i][centre[1]+j] > 0:
-                            taboo_key = str(centre[0]+i)+","+str(centre[1]+j)
-                            if (taboo_key not in ant.taboo or ant.taboo[taboo_key] == 0) and ant.current_carry < ant.carry_capacity:
+                            food_index = self.food_index[centre[0]+i, centre[1]+j]
+                            if ant.taboo[food_index] == 0 and carry < capacity:
                                 if not food_present:
                                     mov_weights = [0]*len(mov_weights)
                                     food_present = True
                                 
                                 mov_weights.append(self.food_grid[centre[0]+i][centre[1]+j])
                             else:
+                                if self.metrics != None and ant.taboo[food_index] > 0:
+                                    self.metrics.count('taboo_hits')
                                 mov_weights.append(0)
 
                         # Probability of moving to a cell where there
                         # is already an ant = 0
-                        elif self.ant_grid[centre[0]+i][centre[1]+j] == 1 or food_present:
+                        elif self.ant_grid[centre[0]+i][centre[1]+j] > 0 or food_present:
                             mov_weights.append(0)
 
-                        else: mov_weights.append(self.pheromones[centre[0]+i][centre[1]+j])
+                        else: mov_weights.append(self.pheromone_field.get(centre[0]+i, centre[1]+j))
                     else: mov_weights.append(0)
                 else: mov_weights.append(0)
 
-        if ant.current_carry == ant.carry_capacity or (len(self.food.keys()) == 0):
+        if carry == capacity or (len(self.food) == 0):
+            centre_distance = self.home_distance[centre[0], centre[1]]
             for i in range(len(mov_weights)):
-                possible_move_location = [centre[0]+movements[i][0], centre[1]+movements[i][1]]
-                if self.manhattan(possible_move_location) > self.manhattan(centre):
+                if self.padded_home_distance[centre[0]+movements[i][0]+1, centre[1]+movements[i][1]+1] > centre_distance:
                     mov_weights[i] = 0
                 elif mov_weights[i] > 0: mov_weights[i] = 1
 
@@ -188,22 +622,36 @@ class aco:
                 mov_weights[i] = (mov_weights[i]**self.alpha)*(self.manhattan([x,y])**self.beta)
             return [x / sum(mov_weights) for x in mov_weights]
         """
+        return self.apply_terrain(centre, mov_weights)
+
+    def apply_terrain(self, centre, mov_weights):
+        """
+        Zeroes movements into blocked cells and divides the rest by the
+        cost of the cell moved into.
+        :param centre:      Ant coordinates
+        :param mov_weights: Movement weights, updated in place
+        :return [float]:    Movement weights
+        """
+        if self.terrain == None:
+            return mov_weights
+
+        allowed = int(self.terrain.passability[centre[0], centre[1]])
+        for i in range(len(mov_weights)):
+            if (allowed >> i) & 1 == 0:
+                mov_weights[i] = 0
+            else:
+                mov_weights[i] = mov_weights[i] / self.terrain.padded_cost[centre[0]+movements[i][0]+1, centre[1]+movements[i][1]+1]
         return mov_weights
 
     def update_pheromones(self):
         """
         Applies pheromone evaporation and deposits.
         """
-        for i in range(self.pheromones.shape[0]):
-            for j in range(self.pheromones.shape[1]):
-                self.pheromones[i][j] *= (1 - self.evaporation_coefficient)
-                if self.pheromones[i][j] < 1.0:
-                    self.pheromones[i][j] = 1.0
+        self.pheromone_field.evaporate()
 
-        for ant in self.ants:
-            x, y = ant.location[0], ant.location[1]
-            if ant.current_carry == ant.carry_capacity:
-                self.pheromones[x][y] += self.pheromone_deposit
+        coors = self.ants.locations[self.ants.full()]
+        if len(coors) > 0:
+            self.pheromone_field.deposit(coors[:, 0], coors[:, 1])
 
     def manhattan(self, coor):
         """
@@ -213,75 +661,177 @@ class aco:
         """
         return abs(coor[0]-self.home_coors[0]) + abs(coor[1]-self.home_coors[1])
 
-    def print_grid(self, home_char='H', ant_char='A', food_char='F', empty_char='.'):
+    def print_grid(self, home_char='H', ant_char='A', food_char='F', empty_char='.', wall_char='#'):
         """
         Prints grid to the console.
         :param home_char:  Character at home coor
         :param ant_char:   Character for all ants
         :param food_char:  Character for food
         :param empty_char: Character for empty tile
+        :param wall_char:  Character for blocked tiles
         """
-        ant_grid, food_grid = self.get_object_grids()
-        print(" "+("-"*(ant_grid.shape[1]*2+1)))
-        for i in range(ant_grid.shape[0]):
-            row = "| "
-            for j in range(ant_grid.shape[1]):
-                if [i, j] == self.home_coors: row += home_char+" "
-                elif food_grid[i, j] > 0: row += food_char+" "
-                elif ant_grid[i, j] == 1: row += ant_char+" "
-                
-                else: row += empty_char+" "
-            print(row+"|")
-        print(" "+("-"*(ant_grid.shape[1]*2+1)))
+        chars = np.array([empty_char, wall_char, ant_char, food_char, home_char])
+        border = " "+("-"*(self.dimensions[1]*2+1))
+        rows = ["| "+" ".join(row)+" |" for row in chars[terminal.cell_codes(self)]]
+        print("\n".join([border]+rows+[border]))
 
     def get_object_grids(self):
         """
-        Returns grids denoting where ants and food are located.
-        :return np.array: Numpy array denoting ants
+        Builds grids denoting where ants and food are located from
+        scratch. The simulation keeps its own copies up to date, so this
+        is only needed on setup and for consistency checks.
+        :return np.array: Numpy array of ant counts
         :return np.array: Numpy array denoting food
         """
         ant_grid = np.zeros(self.dimensions, dtype=int)
         food_grid = np.zeros(self.dimensions, dtype=int)
-        ant_coors, food_coors = self.get_object_coors()
-        for coors in ant_coors:
-            ant_grid[coors[0]][coors[1]] = 1
-        for coors in food_coors:
-            food_grid[coors[0]][coors[1]] += 100
+        locations = self.ants.locations
+        np.add.at(ant_grid, (locations[:, 0], locations[:, 1]), 1)
+        food_locations = self.food.locations[self.food.active]
+        np.add.at(food_grid, (food_locations[:, 0], food_locations[:, 1]), 100)
         return ant_grid, food_grid
 
+    def check_object_grids(self):
+        """
+        Compares the maintained occupancy grids against a full rebuild.
+        Raises a RuntimeError if they have diverged.
+        """
+        ant_grid, food_grid = self.get_object_grids()
+        if not np.array_equal(ant_grid, self.ant_grid):
+            raise RuntimeError("ant_grid does not match ant locations")
+        if not np.array_equal(food_grid, self.food_grid):
+            raise RuntimeError("food_grid does not match food locations")
+
     def get_object_coors(self):
         """
         Returns coordinates of all ants and food.
         :return [[int]]: All ant coordinates
         :return [[int]]: All food coordinates
         """
-        ant_coors = []
-        for ant in self.ants:
-            ant_coors.append(ant.location)
-        food_coors = []
-        for food in self.food.values():
-            food_coors.append(food.location)
+        ant_coors = self.ants.locations.tolist()
+        food_coors = self.food.locations[self.food.active].tolist()
 
         return ant_coors, food_coors
 
-class Ant:
-    def __init__(self, location, carry_capacity=3, taboo_cooldown=5, random_colour=False):
-        self.location = location
-        self.taboo = {}
-        self.taboo_cooldown = taboo_cooldown
-        self.carry_capacity = carry_capacity
-        self.current_carry = 0
-        if random_colour:
-            self.colour = ("#%06x" % rnd.randint(0x55555, 0xFFFFFF)).upper()
+class RunResult:
+    def __init__(self, steps, no_ants, brought_food, food_left, finished, elapsed, seed=None):
+        """
+        Summary of a headless run.
+        :param steps:        Steps taken
+        :param no_ants:      Number of ants moved each step
+        :param brought_food: Food brought home
+        :param food_left:    Food left in food sources
+        :param finished:     If all food was collected
+        :param elapsed:      Wall time in seconds
+        :param seed:         Seed of the simulation
+        """
+        self.seed = seed
+        self.steps = steps
+        self.brought_food = brought_food
+        self.food_left = food_left
+        self.finished = finished
+        self.elapsed = elapsed
+
+        # Time to completion is only known for finished runs
+        self.completion_steps = steps if finished else None
+        self.completion_time = elapsed if finished else None
+
+        if elapsed > 0:
+            self.steps_per_second = steps / elapsed
+            self.ant_moves_per_second = steps * no_ants / elapsed
         else:
-            self.colour = "#FF0000"
+            self.steps_per_second = 0.0
+            self.ant_moves_per_second = 0.0
+
+        # Filled in by run when metrics are enabled
+        self.metrics = None
+
+    def to_dict(self):
+        """
+        Returns the result as a JSON-serialisable dictionary.
+        :return dict: Result values
+        """
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, values):
+        """
+        Creates a result from the values returned by to_dict.
+        :param values:     Result values
+        :return RunResult: Run result
+        """
+        result = cls.__new__(cls)
+        result.__dict__.update(values)
+        return result
+
+def main(args=None):
+    """
+    Command line entry point. Runs the console version by default, or
+    prints a JSON result from a headless run with --headless.
+    :param args: Argument list, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='2D ant colony optimisation simulator.')
+    parser.add_argument('--dimensions', type=int, nargs=2, default=[20, 20], metavar=('ROWS', 'COLUMNS'))
+    parser.add_argument('--ants', type=int, default=25, help='Number of ants')
+    parser.add_argument('--food', type=int, default=10, help='Number of food sources')
+    parser.add_argument('--carry', type=int, default=3, help='Ant carry capacity')
+    parser.add_argument('--food-capacity', type=int, default=10, help='Food in each source')
+    parser.add_argument('--engine', choices=['reference', 'vectorized'], default='reference')
+    parser.add_argument('--pheromones', choices=['dense', 'sparse'], default='dense', help='Pheromone field backend')
+    parser.add_argument('--terrain', default=None, help='Terrain image, dark pixels are walls')
+    parser.add_argument('--home-metric', choices=distance.metrics, default=None,
+                        help='Distance used to find the way home, defaults to bfs with terrain and manhattan without')
+    parser.add_argument('--placement', choices=placement.strategies, default='uniform', help='Food placement strategy')
+    parser.add_argument('--food-file', default=None, help='Food coordinates for --placement file')
+    parser.add_argument('--terminal', action='store_true', help='Only redraws changed cells when printing the grid')
+    parser.add_argument('--fps', type=float, default=10, help='Maximum frames per second with --terminal')
+    parser.add_argument('--delay', type=float, default=0.5, help='Seconds between steps when printing the grid')
+    parser.add_argument('--viewport', type=int, nargs=2, default=None, metavar=('ROWS', 'COLUMNS'), help='Characters shown with --terminal')
+    parser.add_argument('--zoom', type=int, default=1, help='Grid cells per character with --terminal')
+    parser.add_argument('--headless', action='store_true', help='Run without printing or sleeping')
+    parser.add_argument('--steps', type=int, default=None, help='Step budget for headless runs')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint file for headless runs')
+    parser.add_argument('--checkpoint-every', type=int, default=None, help='Steps between checkpoints')
+    parser.add_argument('--restore', default=None, help='Checkpoint file to resume from')
+    parser.add_argument('--metrics', action='store_true', help='Adds phase times and event counts to headless results')
+    parser.add_argument('--cache', default=None, help='Result cache directory for seeded headless runs')
+    parser.add_argument('--cache-size', type=float, default=1024, help='Result cache size limit in MB')
+    args = parser.parse_args(args)
+
+    if args.restore != None:
+        acoApp = aco.load(args.restore)
+    else:
+        acoApp = aco(tuple(args.dimensions), args.ants, args.food,
+                     carry_capacity=args.carry,
+                     food_capacity=args.food_capacity,
+                     engine=args.engine,
+                     pheromone_backend=args.pheromones,
+                     terrain=args.terrain,
+                     home_metric=args.home_metric,
+                     food_placement=args.placement,
+                     placement_options={'path': args.food_file} if args.food_file != None else None,
+                     seed=args.seed)
+
+    if args.checkpoint_every != None and args.checkpoint == None:
+        parser.error("--checkpoint-every needs --checkpoint")
+
+    if args.metrics:
+        acoApp.enable_metrics()
 
-class Food:
-    def __init__(self, location, food_capacity=10):
-        self.location = location
-        self.food_val = food_capacity
-        self.food_capacity = food_capacity
+    if args.headless and args.cache != None and args.seed != None and args.checkpoint == None:
+        # Imported here as the cache module imports this one
+        from cache import ResultCache
+        result_cache = ResultCache(args.cache, max_bytes=int(args.cache_size*2**20))
+        result = result_cache.run(acoApp, max_steps=args.steps)
+        print(json.dumps(result.to_dict()))
+    elif args.headless:
+        result = acoApp.run(max_steps=args.steps, checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every)
+        print(json.dumps(result.to_dict()))
+    elif args.terminal:
+        acoApp.start_aco(args.delay, terminal.TerminalRenderer(fps=args.fps, viewport=args.viewport, zoom=args.zoom, keys=True))
+    else:
+        acoApp.start_aco(args.delay)
 
 if __name__ == "__main__":
-    acoApp = aco((20, 20), 25, 10)
-    acoApp.start_aco()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,5 +1,7 @@
 import time
 from aco import aco
+from render import CanvasRenderer
+from worker import SimulationWorker
 import tkinter as tk
 import numpy as np
 
@@ -140,19 +142,18 @@ class mainWindow:
         self.ants = parameters['ants']
         self.food = parameters['food']
         self.speed = parameters['speed']
+        self.fps = parameters.get('fps', 30)
 
         self.aco = aco((self.rows, self.columns),
                        self.ants, self.food,
                        carry_capacity=parameters['carry'],
                        food_capacity=parameters['fsize'],
                        pheromone_deposit=parameters['deposit'],
-                       evaporation_coefficient=parameters['evap'],
+                       evaporation_coefficient=parameters['evap']/100,
                        home_coors=[int(self.rows/2), int(self.columns/2)],
                        food_deplete=parameters['deplete'],
                        random_ant_colour=parameters['antcolour'])
-        
-        self.grid = []
-        
+
         self.running = False
 
     def display(self):
@@ -172,13 +173,8 @@ class mainWindow:
         self.grid_frame = tk.Frame(master=self.main_window, relief=tk.RAISED,  borderwidth=1)
         self.grid_frame.grid(padx=10, pady=10)
 
-        for y in range(self.rows):
-            row = []
-            for x in range(self.columns):
-                frame = tk.Frame(master=self.grid_frame, width=10, height=10, bg='blue')
-                frame.grid(row=y, column=x, padx=1, pady=1)
-                row.append(frame)
-            self.grid.append(row)
+        self.renderer = CanvasRenderer(self.grid_frame, (self.rows, self.columns))
+        self.renderer.canvas.pack()
 
         frame = tk.Frame(master=self.main_window)
         frame.grid(padx=10, pady=5, columnspan = self.columns)
@@ -200,6 +196,13 @@ class mainWindow:
         frame = tk.Frame(master=self.main_window, width=10, height=15)
         frame.grid(columnspan = self.columns)
 
+        # The simulation steps on a background thread, the window only
+        # draws the latest snapshot it has published
+        self.worker = SimulationWorker(self.aco, delay=self.speed/1000)
+        self.worker.start()
+        self.main_window.protocol("WM_DELETE_WINDOW", self.close)
+        self.render_aco()
+
         self.main_window.mainloop()
 
     def start_aco(self, event):
@@ -210,7 +213,7 @@ class mainWindow:
             self.start_btn_text.set("Start")
             self.pause_btn_text.set("Pause")
             self.running = True
-            self.main_window.after(int(self.speed), self.update_aco)
+            self.worker.resume()
 
     def end_aco(self, event):
         """
@@ -220,39 +223,43 @@ class mainWindow:
             self.start_btn_text.set("Resume")
             self.pause_btn_text.set("Exit Simulation")
             self.running = False
+            self.worker.pause()
         else: 
-            self.main_window.destroy()
+            self.close()
 
-    def update_aco(self):
+    def close(self):
         """
-        Updates the ant colony optimisation grid.
+        Stops the simulation worker and closes the window.
         """
-        if self.running:
-            for x in range(self.columns):
-                for y in range(self.rows):
-                    colour = get_colour((self.aco.pheromones[x][y]-1)/50, [(255, 255, 255), (0, 0, 0)])
-                    self.grid[x][y].config(bg=colour)
-            for ant in self.aco.ants:
-                ant_coors = ant.location
-                self.grid[ant_coors[0]][ant_coors[1]].config(bg=ant.colour)
-
-            home_coors = self.aco.home_coors
-            self.grid[home_coors[0]][home_coors[1]].config(bg='blue')
-
-            for food_key in self.aco.food.keys():
-                food = self.aco.food[food_key].location
-                self.grid[food[0]][food[1]].config(bg=get_colour(self.aco.food[food_key].food_val/self.aco.food[food_key].food_capacity, [(184, 232, 182), (55, 144, 52)]))
-            
-            total_food = self.aco.increment()
-            brought_food = self.aco.brought_food
-            if not self.aco.is_finished():
-                if self.aco.food_deplete:
-                    self.status_text.set("Food left: "+str(total_food)+", food brought home: "+str(brought_food))
-                else: self.status_text.set("Food brought home: "+str(brought_food))
-                self.main_window.after(int(self.speed), self.update_aco)
-            else:
-                self.status.config(fg='green')
-                self.status_text.set("Simulation complete!")
+        self.worker.end()
+        self.main_window.destroy()
+
+    def render_aco(self):
+        """
+        Draws the latest snapshot from the simulation worker. Runs at
+        its own frame rate, independent of the simulation speed.
+        """
+        snapshot = self.worker.latest()
+        if snapshot != None:
+            self.update_aco(snapshot)
+        self.main_window.after(int(1000/self.fps), self.render_aco)
+
+    def update_aco(self, snapshot):
+        """
+        Updates the ant colony optimisation grid and status.
+        :param snapshot: Latest simulation snapshot
+        """
+        self.renderer.draw_snapshot(snapshot)
+        if snapshot.steps == 0:
+            return
+
+        if not snapshot.finished:
+            if snapshot.food_deplete:
+                self.status_text.set("Food left: "+str(snapshot.total_food)+", food brought home: "+str(snapshot.brought_food))
+            else: self.status_text.set("Food brought home: "+str(snapshot.brought_food))
+        else:
+            self.status.config(fg='green')
+            self.status_text.set("Simulation complete!")
             
 def get_colour(progress, colours):
     """
@@ -286,6 +293,7 @@ if __name__ == "__main__":
     param_input.add_parameter('evap', dataType=int, default=5, label='Evaporation Rate (%):',  valRange=[0, 100])
     param_input.add_parameter('speed', dataType=float, default=100, label='Simulation Speed (%):',  valRange=[10, 500])
     param_input.add_parameter('antcolour', dataType=bool, default='False', label='Random ant colour:')
+    param_input.add_parameter('fps', dataType=int, default=30, label='Frame rate (fps):',  valRange=[1, 60])
 
     parameters = param_input.display_window()
 
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import platform
+import argparse
+import itertools
+import tracemalloc
+import numpy as np
+from aco import aco
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+class BenchmarkCase:
+    def __init__(self, engine, size, no_ants, no_food, steps, seed=0, max_seconds=None):
+        """
+        One configuration in the benchmark matrix.
+        :param engine:      aco engine name
+        :param size:        Grid side length, grids are square
+        :param no_ants:     Number of ants
+        :param no_food:     Number of food sources
+        :param steps:       Steps to time
+        :param seed:        Simulation seed
+        :param max_seconds: Stops timing early after this long
+        """
+        self.engine = engine
+        self.size = size
+        self.no_ants = no_ants
+        self.no_food = no_food
+        self.steps = steps
+        self.seed = seed
+        self.max_seconds = max_seconds
+
+    def key(self):
+        return self.engine+"/"+str(self.size)+"x"+str(self.size)+"/"+str(self.no_ants)+" ants/"+str(self.no_food)+" food"
+
+    def create(self):
+        # Food is never depleted, so every case keeps running for all steps
+        return aco((self.size, self.size), self.no_ants, self.no_food, engine=self.engine, food_deplete=False, seed=self.seed)
+
+    def run(self, profile_steps=5):
+        """
+        Times the case, then repeats a few steps under the profiler and
+        tracemalloc for the function split and peak memory.
+        :param profile_steps: Steps to profile
+        :return dict:         Benchmark results
+        """
+        simulation = self.create()
+        steps = 0
+        start = time.perf_counter()
+        while steps < self.steps:
+            simulation.increment()
+            steps += 1
+            if self.max_seconds != None and time.perf_counter() - start > self.max_seconds:
+                break
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        simulation = self.create()
+        for _ in range(min(profile_steps, steps)):
+            simulation.increment()
+        profiler.disable()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'key': self.key(),
+            'engine': self.engine,
+            'size': self.size,
+            'no_ants': self.no_ants,
+            'no_food': self.no_food,
+            'seed': self.seed,
+            'steps': steps,
+            'elapsed': elapsed,
+            'steps_per_second': steps/elapsed,
+            'ant_moves_per_second': steps*self.no_ants/elapsed,
+            'peak_memory': peak_memory,
+            'function_time': function_split(profiler, min(profile_steps, steps))
+        }
+
+def function_split(profiler, steps, limit=10):
+    """
+    Finds the time spent in this repository's functions, excluding time
+    spent in the functions they call.
+    :param profiler: Profiler that ran the steps
+    :param steps:    Number of profiled steps
+    :param limit:    Number of functions to report
+    :return dict:    Function name to seconds per step, slowest first
+    """
+    times = {}
+    for (filename, _, name), (_, _, total_time, _, _) in pstats.Stats(profiler).stats.items():
+        if os.path.dirname(os.path.abspath(filename)) == repo_dir:
+            times[os.path.basename(filename)[:-3]+"."+name] = total_time/max(steps, 1)
+    return dict(sorted(times.items(), key=lambda item: -item[1])[:limit])
+
+def benchmark_cases(engines, sizes, ant_counts, food_counts, steps, seed=0, max_seconds=None):
+    """
+    Builds the benchmark matrix, skipping cases with too few cells.
+    :return [BenchmarkCase]: Benchmark cases
+    """
+    cases = []
+    for engine, size, no_ants, no_food in itertools.product(engines, sizes, ant_counts, food_counts):
+        if no_ants + no_food < size*size:
+            cases.append(BenchmarkCase(engine, size, no_ants, no_food, steps, seed, max_seconds))
+    return cases
+
+def compare(results, baseline, threshold=0.1):
+    """
+    Compares results against a baseline run.
+    :param results:   Benchmark results
+    :param baseline:  Baseline benchmark results
+    :param threshold: Allowed fractional slowdown in steps per second
+    :return [dict]:   Regressed cases, with the baseline and current speeds
+    """
+    baseline_speeds = {result['key']: result['steps_per_second'] for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        if result['key'] not in baseline_speeds:
+            continue
+        ratio = result['steps_per_second']/baseline_speeds[result['key']]
+        if ratio < 1 - threshold:
+            regressions.append({
+                'key': result['key'],
+                'baseline_steps_per_second': baseline_speeds[result['key']],
+                'steps_per_second': result['steps_per_second'],
+                'ratio': ratio
+            })
+    return regressions
+
+def main(args=None):
+    """
+    Command line entry point. Runs the benchmark matrix, saves the
+    results as JSON and optionally flags regressions against a baseline.
+    :param args: Argument list, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks the ACO simulation hot paths.')
+    parser.add_argument('--engines', nargs='+', default=['reference', 'vectorized'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 500, 1000], help='Grid side lengths')
+    parser.add_argument('--ants', type=int, nargs='+', default=[10, 100, 1000], help='Ant counts')
+    parser.add_argument('--food', type=int, nargs='+', default=[5, 50], help='Food counts')
+    parser.add_argument('--steps', type=int, default=50, help='Steps timed per case')
+    parser.add_argument('--max-seconds', type=float, default=10.0, help='Time limit per case')
+    parser.add_argument('--seed', type=int, default=0, help='Simulation seed')
+    parser.add_argument('--output', default='benchmark.json', help='Results file')
+    parser.add_argument('--compare', default=None, help='Baseline results file')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed slowdown when comparing')
+    args = parser.parse_args(args)
+
+    results = {
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'numpy': np.__version__
+        },
+        'results': []
+    }
+    for case in benchmark_cases(args.engines, args.sizes, args.ants, args.food, args.steps, args.seed, args.max_seconds):
+        result = case.run()
+        results['results'].append(result)
+        print("%-45s %10.1f steps/s %12.0f ant moves/s %8.1f MB" % (result['key'], result['steps_per_second'],
+                                                                  result['ant_moves_per_second'], result['peak_memory']/1e6))
+
+    with open(args.output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+
+    if args.compare != None:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print("REGRESSION %-45s %10.1f -> %10.1f steps/s" % (regression['key'], regression['baseline_steps_per_second'],
+                                                                 regression['steps_per_second']))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import os
+import json
+import hashlib
+import inspect
+import argparse
+import numpy as np
+import checkpoint
+from aco import aco, RunResult, engine_version
+from terrain import load_terrain
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Parameters that do not change the results of a run
+ignored_params = ['debug', 'verbose']
+
+def normalise(value):
+    """
+    Converts NumPy values and tuples into plain JSON values, so equal
+    parameters always serialise the same way.
+    """
+    if isinstance(value, np.ndarray):
+        return normalise(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [normalise(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): normalise(item) for key, item in value.items()}
+    return value
+
+def file_hash(path):
+    with open(path, 'rb') as hashed_file:
+        return hashlib.sha256(hashed_file.read()).hexdigest()
+
+def run_key(params, max_steps=None, until_finished=True):
+    """
+    Finds the cache key of a run: a hash of the constructor parameters
+    with defaults filled in, the run arguments and the engine version.
+    Terrain and food files are hashed by their contents.
+    :param params:         aco constructor parameters, including seed
+    :param max_steps:      Step budget of the run
+    :param until_finished: If the run stops once all food is collected
+    :return str:           Hex key, or None if the run has no seed
+    """
+    if params.get('seed') == None:
+        return None
+    bound = inspect.signature(aco.__init__).bind(None, **params)
+    bound.apply_defaults()
+    values = dict(bound.arguments)
+    del values['self']
+    for name in ignored_params:
+        values.pop(name)
+
+    # Defaults resolved as in aco, so equivalent runs share a key
+    if values['nests'] == None:
+        home_coors = values['home_coors']
+        if home_coors == None:
+            home_coors = [int(values['dimensions'][0]/2), int(values['dimensions'][1]/2)]
+        values['nests'] = [home_coors]
+    values['home_coors'] = None
+    if values['home_metric'] == None:
+        values['home_metric'] = 'bfs' if values['terrain'] is not None else 'manhattan'
+    if values['pheromone_update'] == None:
+        values['pheromone_update'] = 'ant' if values['engine'] == 'reference' else 'tick'
+    if values['terrain'] is not None:
+        terrain = load_terrain(values['terrain'])
+        contents = str(terrain.dimensions).encode() + np.packbits(terrain.blocked).tobytes() + terrain.cost.tobytes()
+        values['terrain'] = hashlib.sha256(contents).hexdigest()
+    options = dict(values['placement_options'] or {})
+    if 'path' in options:
+        options['path'] = file_hash(options['path'])
+    values['placement_options'] = options
+
+    key = json.dumps({'params': normalise(values), 'max_steps': max_steps, 'until_finished': until_finished,
+                      'engine_version': engine_version}, sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def simulation_key(simulation, max_steps=None, until_finished=True):
+    """
+    Finds the cache key of running a new simulation.
+    :param simulation:     aco object that has not been stepped
+    :param max_steps:      Step budget of the run
+    :param until_finished: If the run stops once all food is collected
+    :return str:           Hex key
+    """
+    params = dict(simulation.params)
+    params['terrain'] = simulation.terrain
+    params['nests'] = simulation.nests
+    params['home_metric'] = simulation.home_metric
+    return run_key(params, max_steps, until_finished)
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=1 << 30, store_state=False):
+        """
+        Results of completed runs on local disk, addressed by run_key.
+        A seeded run is a pure function of its parameters, so repeated
+        runs are read back instead of recomputed. Each entry is a JSON
+        summary, and optionally a checkpoint of the final state. Entries
+        are touched when read, and the least recently used are removed
+        once the cache is over max_bytes. Hit counts are kept in a stats
+        file shared by every process using the directory.
+        :param directory:   Cache directory, created if missing
+        :param max_bytes:   Size limit of the cache
+        :param store_state: Also saves the final state of each run
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.store_state = store_state
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key+extension)
+
+    def get(self, key, simulation=None):
+        """
+        Reads a cached result.
+        :param key:        Run key
+        :param simulation: aco object to restore the final state into,
+                           if the entry has one
+        :return RunResult: Cached result, or None on a miss
+        """
+        summary_path = self.path(key, '.json')
+        try:
+            with open(summary_path) as summary_file:
+                result = RunResult.from_dict(json.load(summary_file))
+            size = os.path.getsize(summary_path)
+            if simulation != None:
+                state_path = self.path(key, '.ckpt')
+                if not os.path.exists(state_path):
+                    self.record(misses=1)
+                    return None
+                state, arrays = checkpoint.read_checkpoint(state_path, mmap=False)
+                simulation.restore(state, arrays)
+                size += os.path.getsize(state_path)
+                os.utime(state_path)
+            os.utime(summary_path)
+        except (OSError, ValueError, KeyError):
+            # Missing, evicted by another process or from an older format
+            self.record(misses=1)
+            return None
+
+        self.record(hits=1, bytes_saved=size, seconds_saved=result.elapsed)
+        return result
+
+    def put(self, key, result, simulation=None):
+        """
+        Stores a result, then evicts entries if the cache is too large.
+        :param key:        Run key
+        :param result:     RunResult of the run
+        :param simulation: aco object holding the final state, saved if
+                           the cache stores state
+        """
+        previous = self.entry_size(key)
+        if self.store_state and simulation != None:
+            simulation.save(self.path(key, '.ckpt'))
+        temp_path = self.path(key, '.json.tmp')
+        with open(temp_path, 'w') as summary_file:
+            json.dump(result.to_dict(), summary_file)
+        os.replace(temp_path, self.path(key, '.json'))
+
+        # The directory is only scanned once the running total passes the
+        # limit, or when there is no total yet for this directory
+        change = self.entry_size(key) - previous
+        stats = self.record(stored=change)
+        if stats['stored'] > self.max_bytes or stats['stored'] == change:
+            self.evict()
+
+    def run(self, simulation, max_steps=None, until_finished=True):
+        """
+        Runs a simulation as aco.run, reusing a cached result if there
+        is one. On a hit the simulation is only advanced to its final
+        state if the cache stores state. Simulations that were already
+        stepped, or record frames or metrics, are always run.
+        :param simulation:     aco object
+        :param max_steps:      Maximum number of steps, or None for no limit
+        :param until_finished: Stops early once all food is collected
+        :return RunResult:     Summary of the run. Timings are those of
+                               the run that filled the cache.
+        """
+        if simulation.steps != 0 or simulation.recorder != None or simulation.metrics != None:
+            return simulation.run(max_steps, until_finished)
+
+        key = simulation_key(simulation, max_steps, until_finished)
+        result = self.get(key, simulation if self.store_state else None)
+        if result == None:
+            result = simulation.run(max_steps, until_finished)
+            self.put(key, result, simulation)
+        return result
+
+    def entries(self):
+        """
+        Lists cached entries.
+        :return [tuple]: (last used time, bytes, paths) of each entry
+        """
+        entries = {}
+        for item in os.scandir(self.directory):
+            name = item.name
+            if not (name.endswith('.json') or name.endswith('.ckpt')) or name == 'stats.json':
+                continue
+            try:
+                info = item.stat()
+            except OSError:
+                continue
+            used, size, paths = entries.get(name[:-5], (0, 0, []))
+            entries[name[:-5]] = (max(used, info.st_mtime), size + info.st_size, paths + [item.path])
+        return list(entries.values())
+
+    def entry_size(self, key):
+        """
+        :return int: Bytes used by one entry, 0 if it is not cached
+        """
+        size = 0
+        for extension in ['.json', '.ckpt']:
+            try:
+                size += os.path.getsize(self.path(key, extension))
+            except OSError:
+                pass
+        return size
+
+    def size(self):
+        """
+        :return int: Bytes used by cached entries
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        max_bytes, and resets the running total of stored bytes.
+        :return int: Number of entries removed
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, paths in entries:
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        self.record(replace={'stored': total}, evictions=removed)
+        return removed
+
+    def clear(self):
+        """
+        Removes every entry and resets the stats.
+        """
+        for _, _, paths in self.entries():
+            for path in paths:
+                os.remove(path)
+        if os.path.exists(self.path('stats', '.json')):
+            os.remove(self.path('stats', '.json'))
+
+    def record(self, replace=None, **counts):
+        """
+        Adds to the shared stats, locking the stats file where the
+        platform allows.
+        :param replace: Stat name to value to set, before adding counts
+        :param counts:  Stat name to amount to add
+        :return dict:   Updated stats
+        """
+        with open(self.path('stats', '.json'), 'a+') as stats_file:
+            if fcntl != None:
+                fcntl.flock(stats_file, fcntl.LOCK_EX)
+            stats_file.seek(0)
+            text = stats_file.read()
+            stats = json.loads(text) if text.strip() != '' else {}
+            stats.update(replace or {})
+            for name, amount in counts.items():
+                stats[name] = stats.get(name, 0) + amount
+            stats_file.seek(0)
+            stats_file.truncate()
+            json.dump(stats, stats_file)
+        return stats
+
+    def stats(self):
+        """
+        Reads the shared stats.
+        :return dict: hits, misses, hit_rate, bytes_saved (size of the
+                      entries read back), seconds_saved (run time of the
+                      entries read back), evictions, entries and bytes
+        """
+        stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'seconds_saved': 0.0, 'evictions': 0}
+        try:
+            with open(self.path('stats', '.json')) as stats_file:
+                stats.update(json.load(stats_file))
+        except (OSError, ValueError):
+            pass
+        # Running total used for eviction, the scanned size is given below
+        stats.pop('stored', None)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups > 0 else 0.0
+        entries = self.entries()
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries)
+        return stats
+
+def main(args=None):
+    """
+    Command line entry point. Prints the stats of a result cache.
+    :param args: Argument list, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Shows or clears a cache of ACO run results.')
+    parser.add_argument('directory', help='Cache directory')
+    parser.add_argument('--clear', action='store_true', help='Removes every entry')
+    args = parser.parse_args(args)
+
+    cache = ResultCache(args.directory)
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import json
+import struct
+import zipfile
+import numpy as np
+
+# Increased whenever the layout of saved state changes
+format_version = 4
+
+def write_checkpoint(path, state, arrays):
+    """
+    Writes a checkpoint file: an uncompressed zip archive holding the
+    state as JSON and each array as a raw .npy member, so arrays can be
+    memory-mapped straight out of the file. The file is written to a
+    temporary path first, so an interrupted write never leaves a broken
+    checkpoint behind.
+    :param path:   Checkpoint file path
+    :param state:  JSON-serialisable dictionary of scalar state
+    :param arrays: Dictionary of name to NumPy array
+    """
+    temp_path = path+".tmp"
+    with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('state.json', json.dumps(dict(state, format_version=format_version)))
+        for name, array in arrays.items():
+            with archive.open(name+".npy", 'w', force_zip64=True) as member:
+                np.lib.format.write_array(member, np.ascontiguousarray(array), allow_pickle=False)
+    os.replace(temp_path, path)
+
+def read_checkpoint(path, mmap=True):
+    """
+    Reads a checkpoint file written by write_checkpoint.
+    :param path:  Checkpoint file path
+    :param mmap:  Memory-maps arrays copy-on-write instead of reading them
+    :return dict: Scalar state
+    :return dict: Dictionary of name to NumPy array
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        state = json.loads(archive.read('state.json'))
+        if state.get('format_version') != format_version:
+            raise ValueError("unsupported checkpoint format: "+str(state.get('format_version')))
+
+        members = [info for info in archive.infolist() if info.filename.endswith('.npy')]
+        if not mmap:
+            for info in members:
+                with archive.open(info) as member:
+                    arrays[info.filename[:-4]] = np.lib.format.read_array(member, allow_pickle=False)
+            return state, arrays
+
+    with open(path, 'rb') as checkpoint_file:
+        for info in members:
+            # Array data starts after the zip local header and .npy header
+            checkpoint_file.seek(info.header_offset+26)
+            name_length, extra_length = struct.unpack('<HH', checkpoint_file.read(4))
+            checkpoint_file.seek(info.header_offset+30+name_length+extra_length)
+            version = np.lib.format.read_magic(checkpoint_file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(checkpoint_file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(checkpoint_file)
+
+            if int(np.prod(shape)) == 0:
+                arrays[info.filename[:-4]] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[info.filename[:-4]] = np.memmap(path, dtype=dtype, mode='c', offset=checkpoint_file.tell(),
+                                                       shape=shape, order='F' if fortran_order else 'C')
+    return state, arrays
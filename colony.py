@@ -0,0 +1,101 @@
+import numpy as np
+
+class Colony:
+    def __init__(self, no_ants, location, no_food, carry_capacity=3, taboo_cooldown=5, random_colour=False, rng=None):
+        """
+        Structure-of-arrays store for every ant in the simulation.
+        :param no_ants:        Number of ants
+        :param location:       Starting coordinate shared by all ants
+        :param no_food:        Number of food sources, for taboo tracking
+        :param carry_capacity: Food each ant can carry
+        :param taboo_cooldown: Moves before an ant returns to the same food
+        :param random_colour:  Gives each ant a random display colour
+        :param rng:            NumPy generator for random colours
+        """
+        self.locations = np.empty((no_ants, 2), dtype=np.int32)
+        self.locations[:] = location
+        self.carry = np.zeros(no_ants, dtype=np.int32)
+        self.capacity = np.full(no_ants, carry_capacity, dtype=np.int32)
+        self.taboo_cooldown = taboo_cooldown
+
+        # Moves left before each ant can collect from each food source,
+        # indexed by Food.index
+        self.taboo = np.zeros((no_ants, no_food), dtype=np.uint8)
+
+        if random_colour:
+            if rng == None:
+                rng = np.random.default_rng()
+            self.colours = [("#%06x" % colour).upper() for colour in rng.integers(0x55555, 0xFFFFFF, size=no_ants, endpoint=True)]
+            self.colour_index = np.arange(no_ants, dtype=np.int32)
+        else:
+            self.colours = ["#FF0000"]
+            self.colour_index = np.zeros(no_ants, dtype=np.int32)
+
+    def __len__(self):
+        return self.locations.shape[0]
+
+    def __getitem__(self, index):
+        if index < 0 or index >= len(self):
+            raise IndexError("ant index out of range")
+        return Ant(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Ant(self, index)
+
+    def cool_taboo(self):
+        """
+        Counts down every active taboo by one move.
+        """
+        np.subtract(self.taboo, 1, out=self.taboo, where=self.taboo > 0)
+
+    def full(self):
+        """
+        Finds ants carrying as much food as they can.
+        :return np.array: Boolean mask of full ants
+        """
+        return self.carry == self.capacity
+
+class Ant:
+    __slots__ = ('colony', 'index')
+
+    def __init__(self, colony, index):
+        """
+        Lightweight view of a single ant stored in a Colony.
+        :param colony: Colony holding the ant
+        :param index:  Index of the ant in the colony
+        """
+        self.colony = colony
+        self.index = index
+
+    @property
+    def location(self):
+        return self.colony.locations[self.index].tolist()
+
+    @location.setter
+    def location(self, coors):
+        self.colony.locations[self.index] = coors
+
+    @property
+    def current_carry(self):
+        return int(self.colony.carry[self.index])
+
+    @current_carry.setter
+    def current_carry(self, value):
+        self.colony.carry[self.index] = value
+
+    @property
+    def carry_capacity(self):
+        return int(self.colony.capacity[self.index])
+
+    @property
+    def taboo_cooldown(self):
+        return self.colony.taboo_cooldown
+
+    @property
+    def taboo(self):
+        return self.colony.taboo[self.index]
+
+    @property
+    def colour(self):
+        return self.colony.colours[self.colony.colour_index[self.index]]
@@ -0,0 +1,68 @@
+import numpy as np
+import kernel
+
+metrics = ['manhattan', 'chebyshev', 'bfs']
+
+# Distance of cells that cannot reach any nest
+unreachable = np.iinfo(np.int32).max
+
+def distance_field(dimensions, nests, metric='manhattan', passable=None):
+    """
+    Finds the distance from every cell to the nearest nest.
+    'manhattan' and 'chebyshev' are straight line distances. 'bfs'
+    counts the fewest ant moves, going around cells that are not
+    passable.
+    :param dimensions: Grid dimensions
+    :param nests:      List of nest coordinates
+    :param metric:     Distance metric, one of metrics
+    :param passable:   Boolean grid of cells ants can enter, for 'bfs'
+    :return np.array:  int32 grid of distances
+    """
+    if metric not in metrics:
+        raise ValueError("metric must be one of "+", ".join(metrics))
+    if metric == 'bfs':
+        return bfs_distance(dimensions, nests, passable)
+
+    xs = np.arange(dimensions[0])[:, None]
+    ys = np.arange(dimensions[1])[None, :]
+    distance = np.full(dimensions, unreachable, dtype=np.int32)
+    for x, y in nests:
+        if metric == 'manhattan':
+            nest_distance = np.abs(xs-x) + np.abs(ys-y)
+        else:
+            nest_distance = np.maximum(np.abs(xs-x), np.abs(ys-y))
+        np.minimum(distance, nest_distance, out=distance)
+    return distance
+
+def bfs_distance(dimensions, nests, passable=None):
+    """
+    Breadth-first search outwards from every nest at once, using the
+    same 8 movements as the ants. Each ring of the search is found by
+    shifting the previous ring in every direction.
+    :param dimensions: Grid dimensions
+    :param nests:      List of nest coordinates
+    :param passable:   Boolean grid of cells ants can enter, or None
+    :return np.array:  int32 grid of distances
+    """
+    padded_distance, distance = kernel.padded(dimensions, np.int32, fill=unreachable)
+    padded_open, open_cells = kernel.padded(dimensions, bool)
+    open_cells[:] = True if passable is None else passable
+
+    padded_frontier, frontier = kernel.padded(dimensions, bool)
+    for x, y in nests:
+        frontier[x, y] = True
+    distance[frontier] = 0
+    padded_open[padded_frontier] = False
+
+    step = 0
+    reached = np.empty(padded_frontier.shape, dtype=bool)
+    while frontier.any():
+        step += 1
+        reached[:] = False
+        for dx, dy in kernel.offsets.tolist():
+            reached[1:-1, 1:-1] |= padded_frontier[1+dx:dimensions[0]+1+dx, 1+dy:dimensions[1]+1+dy]
+        reached &= padded_open
+        padded_distance[reached] = step
+        padded_open[reached] = False
+        padded_frontier[:] = reached
+    return distance
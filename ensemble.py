@@ -0,0 +1,255 @@
+import time
+import numpy as np
+import kernel
+from aco import RunResult
+
+class StackedRng:
+    def __init__(self, rngs, no_ants):
+        """
+        Draws for several colonies at once, each from its own generator,
+        so every colony sees the same draws as it would running alone.
+        :param rngs:    Generator of each colony
+        :param no_ants: Ants per colony
+        """
+        self.rngs = rngs
+        self.no_ants = no_ants
+
+    def random(self, size):
+        if size != len(self.rngs)*self.no_ants:
+            raise ValueError("expected one draw per ant")
+        return np.concatenate([rng.random(self.no_ants) for rng in self.rngs])
+
+def incompatibility(simulations):
+    """
+    Finds why simulations cannot run as one ensemble.
+    :param simulations: aco objects
+    :return str:        Reason, or None if they can
+    """
+    first = simulations[0]
+    for simulation in simulations:
+        if simulation.engine != 'vectorized':
+            return "ensembles need the vectorized engine"
+        if not hasattr(simulation.pheromone_field, 'padded'):
+            return "ensembles need the dense pheromone backend"
+        if simulation.terrain != None:
+            return "ensembles do not support terrain"
+        if tuple(simulation.dimensions) != tuple(first.dimensions) or simulation.ants.taboo.shape != first.ants.taboo.shape:
+            return "ensemble colonies need the same dimensions, ant count and food count"
+    return None
+
+class Ensemble:
+    def __init__(self, simulations):
+        """
+        Steps many independent colonies together. Every colony's grids
+        are stacked along a first axis, so pheromones are (colonies, H, W)
+        and ant locations (colonies, ants, 2), and one vectorized step
+        moves every ant of every colony. Colonies follow the vectorized
+        engine and draw from their own generators, so each ends exactly
+        as it would if run on its own. Finished colonies are written back
+        to their aco objects and dropped from the stacked arrays.
+        :param simulations: aco objects using the vectorized engine, with
+                            the same dimensions, ant count and food count
+        """
+        reason = incompatibility(simulations)
+        if reason != None:
+            raise ValueError(reason)
+
+        first = simulations[0]
+        self.simulations = list(simulations)
+        self.dimensions = tuple(first.dimensions)
+        self.no_ants = len(first.ants)
+        max_nests = max(len(simulation.nests) for simulation in simulations)
+
+        # Position in self.simulations of each colony still running
+        self.colonies = np.arange(len(simulations))
+        self.steps = np.zeros(len(simulations), dtype=np.int64)
+        self.start_steps = [simulation.steps for simulation in simulations]
+        self.results = [None]*len(simulations)
+
+        self.pheromones = np.stack([simulation.pheromone_field.padded for simulation in simulations])
+        self.evaporation = np.array([simulation.pheromone_field.evaporation_coefficient for simulation in simulations])
+        self.deposit = np.array([simulation.pheromone_field.deposit_amount for simulation in simulations])
+        self.floor = np.array([simulation.pheromone_field.floor for simulation in simulations])
+        self.ant_grid = np.stack([simulation.padded_ant_grid for simulation in simulations])
+        self.food_grid = np.stack([simulation.padded_food_grid for simulation in simulations])
+        self.food_index = np.stack([simulation.padded_food_index for simulation in simulations])
+        self.home_grid = np.stack([simulation.padded_home_grid for simulation in simulations])
+        self.nest_index = np.stack([simulation.padded_nest_index for simulation in simulations])
+        self.home_distance = np.stack([simulation.padded_home_distance for simulation in simulations])
+
+        self.locations = np.stack([simulation.ants.locations for simulation in simulations])
+        self.carry = np.stack([simulation.ants.carry for simulation in simulations])
+        self.capacity = np.stack([simulation.ants.capacity for simulation in simulations])
+        self.taboo = np.stack([simulation.ants.taboo for simulation in simulations])
+        self.taboo_cooldown = np.array([simulation.ants.taboo_cooldown for simulation in simulations])
+
+        self.food_values = np.stack([simulation.food.values for simulation in simulations])
+        self.food_remaining = np.array([simulation.food.remaining for simulation in simulations])
+        self.food_deplete = np.array([simulation.food_deplete for simulation in simulations])
+        self.all_food = np.array([simulation.all_food for simulation in simulations])
+        self.brought_food = np.array([simulation.brought_food for simulation in simulations], dtype=np.int64)
+        self.nest_food = np.zeros((len(simulations), max_nests), dtype=np.int64)
+        for row, simulation in enumerate(simulations):
+            self.nest_food[row, :len(simulation.nests)] = simulation.nest_food
+        self.resolve_conflicts = np.array([simulation.resolve_conflicts for simulation in simulations])
+
+    def __len__(self):
+        return len(self.colonies)
+
+    def finished(self):
+        """
+        Checks which running colonies have collected all their food, as
+        aco.is_finished.
+        :return np.array: (colonies,) if each colony is finished
+        """
+        carried = self.carry.sum(axis=1)
+        return (self.all_food == self.brought_food) | ((carried == 0) & (self.food_remaining == 0))
+
+    def step(self):
+        """
+        Moves every ant of every running colony once, following
+        aco.move_ants_batched.
+        """
+        colonies, ants = self.locations.shape[:2]
+        np.subtract(self.taboo, 1, out=self.taboo, where=self.taboo > 0)
+
+        locations = self.locations.reshape(-1, 2)
+        rows = np.repeat(np.arange(colonies), ants)
+        xs, ys = kernel.neighbours(locations)
+        cs = rows[:, None]
+        px, py = xs+1, ys+1
+
+        food_index = self.food_index[cs, px, py]
+        taboo_rows = self.taboo.reshape(colonies*ants, self.taboo.shape[2])
+        if taboo_rows.shape[1] > 0:
+            taboo = (taboo_rows[np.arange(len(locations))[:, None], np.maximum(food_index, 0)] > 0) & (food_index >= 0)
+        else:
+            taboo = np.zeros(xs.shape, dtype=bool)
+
+        carry, capacity = self.carry.reshape(-1), self.capacity.reshape(-1)
+        centre = self.home_distance[rows, locations[:, 0]+1, locations[:, 1]+1]
+        homing = (carry == capacity) | (self.food_remaining == 0)[rows]
+        weights = kernel.movement_weights(carry, capacity, self.pheromones[cs, px, py], self.food_grid[cs, px, py],
+                                          self.ant_grid[cs, px, py] > 0, self.home_grid[cs, px, py],
+                                          taboo, self.home_distance[cs, px, py] <= centre[:, None], homing)
+
+        rngs = [self.simulations[colony].rng for colony in self.colonies.tolist()]
+        choices, moving = kernel.sample_moves(weights, StackedRng(rngs, ants))
+        ant_rows = np.arange(len(locations))
+        new_xs, new_ys = xs[ant_rows, choices], ys[ant_rows, choices]
+
+        if self.resolve_conflicts.any():
+            shared = (self.food_grid[rows, new_xs+1, new_ys+1] > 0) | self.home_grid[rows, new_xs+1, new_ys+1]
+            shared |= ~self.resolve_conflicts[rows]
+            cells = (self.dimensions[0]+2)*(self.dimensions[1]+2)
+            kernel.resolve_conflicts(rows*cells + new_xs*self.dimensions[1] + new_ys, moving, shared)
+
+        movers = np.flatnonzero(moving)
+        new_xs, new_ys, mover_rows = new_xs[movers], new_ys[movers], rows[movers]
+        np.subtract.at(self.ant_grid, (mover_rows, locations[movers, 0]+1, locations[movers, 1]+1), 1)
+        np.add.at(self.ant_grid, (mover_rows, new_xs+1, new_ys+1), 1)
+        locations[movers, 0] = new_xs
+        locations[movers, 1] = new_ys
+
+        # Pickups are applied one at a time, in colony then ant order
+        on_food = self.food_grid[mover_rows, new_xs+1, new_ys+1] > 0
+        taboo_cooldown = self.taboo_cooldown[mover_rows[on_food]].tolist()
+        for i, row, x, y, cooldown in zip(movers[on_food].tolist(), mover_rows[on_food].tolist(), new_xs[on_food].tolist(),
+                                          new_ys[on_food].tolist(), taboo_cooldown):
+            index = self.food_index[row, x+1, y+1]
+            if index < 0:
+                continue
+            taboo_rows[i, index] = cooldown
+            carry[i] += 1
+            if self.food_values[row, index] > 1:
+                if self.food_deplete[row]:
+                    self.food_values[row, index] -= 1
+            else:
+                self.food_values[row, index] = 0
+                self.food_remaining[row] -= 1
+                self.food_grid[row, x+1, y+1] -= 100
+                self.food_index[row, x+1, y+1] = -1
+
+        at_home = self.home_grid[mover_rows, new_xs+1, new_ys+1] & ~on_food
+        delivered = carry[movers[at_home]]
+        np.add.at(self.brought_food, mover_rows[at_home], delivered)
+        np.add.at(self.nest_food, (mover_rows[at_home], self.nest_index[mover_rows[at_home], new_xs[at_home]+1, new_ys[at_home]+1]), delivered)
+        carry[movers[at_home]] = 0
+
+        interior = self.pheromones[:, 1:-1, 1:-1]
+        np.multiply(interior, (1 - self.evaporation)[:, None, None], out=interior)
+        np.maximum(interior, self.floor[:, None, None], out=interior)
+        full = carry == capacity
+        np.add.at(self.pheromones, (rows[full], locations[full, 0]+1, locations[full, 1]+1), self.deposit[rows[full]])
+
+        self.steps[self.colonies] += 1
+
+    def run(self, max_steps=None, until_finished=True):
+        """
+        Runs every colony, as aco.run. Colonies stop on their own when
+        finished or out of steps, while the rest carry on.
+        :param max_steps:      Maximum number of steps, or None for no limit
+        :param until_finished: Stops each colony once all its food is collected
+        :return [RunResult]:   Result of each colony, in the order given.
+                               elapsed is the ensemble's time until the
+                               colony stopped.
+        """
+        if max_steps == None and not until_finished:
+            raise ValueError("run needs max_steps when until_finished is False")
+
+        start = time.perf_counter()
+        steps = 0
+        while len(self) > 0:
+            done = np.zeros(len(self), dtype=bool)
+            if until_finished:
+                done |= self.finished()
+            if max_steps != None and steps >= max_steps:
+                done[:] = True
+            if done.any():
+                self.retire(done, time.perf_counter() - start)
+                if len(self) == 0:
+                    break
+            self.step()
+            steps += 1
+        return self.results
+
+    def retire(self, done, elapsed):
+        """
+        Writes finished colonies back to their aco objects, records their
+        results and drops them from the stacked arrays.
+        :param done:    (colonies,) if each running colony is finished
+        :param elapsed: Seconds since the run started
+        """
+        finished = self.finished()
+        for row in np.flatnonzero(done).tolist():
+            colony = int(self.colonies[row])
+            simulation = self.sync(row)
+            self.results[colony] = RunResult(int(self.steps[colony]), self.no_ants, simulation.brought_food,
+                                             simulation.food_left(), bool(finished[row]), elapsed, simulation.seed)
+
+        keep = ~done
+        self.colonies = self.colonies[keep]
+        for name in ['pheromones', 'evaporation', 'deposit', 'floor', 'ant_grid', 'food_grid', 'food_index', 'home_grid',
+                     'nest_index', 'home_distance', 'locations', 'carry', 'capacity', 'taboo', 'taboo_cooldown', 'food_values',
+                     'food_remaining', 'food_deplete', 'all_food', 'brought_food', 'nest_food', 'resolve_conflicts']:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def sync(self, row):
+        """
+        Copies a running colony's state into its aco object.
+        :param row:  Row of the colony in the stacked arrays
+        :return aco: Updated simulation
+        """
+        colony = int(self.colonies[row])
+        simulation = self.simulations[colony]
+        simulation.pheromone_field.padded[:] = self.pheromones[row]
+        simulation.padded_ant_grid[:] = self.ant_grid[row]
+        simulation.ants.locations[:] = self.locations[row]
+        simulation.ants.carry[:] = self.carry[row]
+        simulation.ants.taboo[:] = self.taboo[row]
+        simulation.food.update(self.food_values[row])
+        simulation.brought_food = int(self.brought_food[row])
+        simulation.carried_food = int(self.carry[row].sum())
+        simulation.nest_food[:] = self.nest_food[row, :len(simulation.nests)]
+        simulation.steps = self.start_steps[colony] + int(self.steps[colony])
+        return simulation
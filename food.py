@@ -0,0 +1,166 @@
+import numpy as np
+import kernel
+
+class FoodStore:
+    def __init__(self, dimensions, locations, food_capacity=10, bucket_size=8):
+        """
+        Structure-of-arrays store for every food source, indexed by
+        Food.index. Sources are found by cell through an index grid,
+        and by distance through a grid of buckets. The number of sources
+        left and the total food left are kept up to date as food is
+        taken, so neither needs a scan.
+        :param dimensions:    Grid dimensions
+        :param locations:     (n, 2) food coordinates, in index order
+        :param food_capacity: Food in each source
+        :param bucket_size:   Side length of the nearest-food buckets
+        """
+        self.dimensions = dimensions
+        self.bucket_size = bucket_size
+        self.locations = np.array(locations, dtype=np.int32).reshape(-1, 2)
+        self.capacity = np.full(len(self.locations), food_capacity, dtype=np.int64)
+        self.values = self.capacity.copy()
+        self.active = np.ones(len(self.locations), dtype=bool)
+
+        # 100 per source, as read by the movement rules, and the index
+        # of the source in each cell or -1. Stored padded like the other
+        # occupancy grids.
+        self.padded_grid, self.grid = kernel.padded(dimensions, int)
+        self.padded_index, self.index_grid = kernel.padded(dimensions, np.int32, fill=-1)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuilds the grids, buckets and totals from the source arrays.
+        """
+        self.grid[:] = 0
+        self.index_grid[:] = -1
+        indexes = np.flatnonzero(self.active)
+        xs, ys = self.locations[indexes, 0], self.locations[indexes, 1]
+        np.add.at(self.grid, (xs, ys), 100)
+        self.index_grid[xs, ys] = indexes
+
+        self.buckets = {}
+        for index, x, y in zip(indexes.tolist(), xs.tolist(), ys.tolist()):
+            self.buckets.setdefault((x//self.bucket_size, y//self.bucket_size), []).append(index)
+
+        self.remaining = len(indexes)
+        self.total = int(self.values[indexes].sum())
+
+    def __len__(self):
+        return self.remaining
+
+    def __getitem__(self, index):
+        if index < 0 or index >= len(self.locations):
+            raise IndexError("food index out of range")
+        return Food(self, index)
+
+    def __iter__(self):
+        for index in np.flatnonzero(self.active).tolist():
+            yield Food(self, index)
+
+    def at(self, x, y):
+        """
+        Finds the food source in a cell.
+        :param x:    x coordinate
+        :param y:    y coordinate
+        :return int: Food index, or -1 if there is no food
+        """
+        return int(self.index_grid[x, y])
+
+    def take(self, index, deplete=True):
+        """
+        Takes one unit of food from a source, removing the source when
+        its last unit is taken.
+        :param index:   Food index
+        :param deplete: Reduces the food left in the source
+        :return bool:   If the source was removed
+        """
+        if self.values[index] > 1:
+            if deplete:
+                self.values[index] -= 1
+                self.total -= 1
+            return False
+        self.remove(index)
+        return True
+
+    def remove(self, index):
+        """
+        Removes a food source from the grid.
+        :param index: Food index
+        """
+        if not self.active[index]:
+            return
+        x, y = self.locations[index].tolist()
+        self.active[index] = False
+        self.remaining -= 1
+        self.total -= int(self.values[index])
+        self.values[index] = 0
+        self.grid[x, y] -= 100
+        self.index_grid[x, y] = -1
+        self.buckets[(x//self.bucket_size, y//self.bucket_size)].remove(index)
+
+    def update(self, values):
+        """
+        Replaces the food left in every source, removing sources with
+        none left.
+        :param values: (n,) food left, by Food.index
+        """
+        for index in np.flatnonzero(self.active & (values == 0)).tolist():
+            self.remove(index)
+        self.values[:] = values
+        self.total = int(self.values[self.active].sum())
+
+    def nearest(self, x, y):
+        """
+        Finds the closest food source left, by straight line distance.
+        Buckets are searched in growing rings around the cell, stopping
+        once no closer source can be found.
+        :param x:    x coordinate
+        :param y:    y coordinate
+        :return int: Food index, or -1 if there is no food
+        """
+        if self.remaining == 0:
+            return -1
+
+        size = self.bucket_size
+        bx, by = x//size, y//size
+        max_ring = max(bx, by, (self.dimensions[0]-1)//size - bx, (self.dimensions[1]-1)//size - by)
+        best, best_distance = -1, None
+        for ring in range(max_ring+1):
+            for i in range(bx-ring, bx+ring+1):
+                for j in range(by-ring, by+ring+1):
+                    if max(abs(i-bx), abs(j-by)) != ring:
+                        continue
+                    for index in self.buckets.get((i, j), []):
+                        fx, fy = self.locations[index].tolist()
+                        distance = (fx-x)**2 + (fy-y)**2
+                        if best_distance == None or distance < best_distance or (distance == best_distance and index < best):
+                            best, best_distance = index, distance
+            # Buckets further out are at least ring*size+1 cells away
+            if best_distance != None and best_distance <= (ring*size)**2:
+                break
+        return best
+
+class Food:
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        """
+        Lightweight view of a single food source stored in a FoodStore.
+        :param store: FoodStore holding the source
+        :param index: Index of the source in the store
+        """
+        self.store = store
+        self.index = index
+
+    @property
+    def location(self):
+        return self.store.locations[self.index].tolist()
+
+    @property
+    def food_val(self):
+        return int(self.store.values[self.index])
+
+    @property
+    def food_capacity(self):
+        return int(self.store.capacity[self.index])
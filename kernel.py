@@ -0,0 +1,108 @@
+import numpy as np
+
+# Same order as aco.movements
+offsets = np.array([[-1, -1], [-1, 0], [-1, 1], [0, -1], [0, 1], [1, -1], [1, 0], [1, 1]], dtype=np.int32)
+
+def padded(dimensions, dtype, fill=0):
+    """
+    Allocates a grid with a one cell border, so that neighbourhood
+    gathers never go out of bounds.
+    :param dimensions: Interior grid dimensions
+    :param dtype:      Grid data type
+    :param fill:       Initial value, including the border
+    :return np.array:  Padded grid
+    :return np.array:  View of the interior of the padded grid
+    """
+    grid = np.full((dimensions[0]+2, dimensions[1]+2), fill, dtype=dtype)
+    return grid, grid[1:-1, 1:-1]
+
+def neighbours(locations):
+    """
+    Finds the 8 adjacent cells of every ant.
+    :param locations: (n, 2) array of ant coordinates
+    :return np.array: (n, 8) array of neighbour x coordinates
+    :return np.array: (n, 8) array of neighbour y coordinates
+    """
+    xs = locations[:, 0, None] + offsets[:, 0]
+    ys = locations[:, 1, None] + offsets[:, 1]
+    return xs, ys
+
+def movement_weights(carry, capacity, pheromone, food, occupied, home, taboo, closer, homing):
+    """
+    Finds movement weights for every ant at once. Follows the same rules
+    as aco.get_movement_probs, with one row per ant and one column per
+    entry in movements. Cells outside the grid must have zero pheromone
+    and food.
+    :param carry:     (n,) food carried by each ant
+    :param capacity:  (n,) carry capacity of each ant
+    :param pheromone: (n, 8) pheromone at each neighbour
+    :param food:      (n, 8) food weight at each neighbour
+    :param occupied:  (n, 8) if another ant is at each neighbour
+    :param home:      (n, 8) if each neighbour is a home cell
+    :param taboo:     (n, 8) if food at each neighbour is taboo for the ant
+    :param closer:    (n, 8) if each neighbour is no further from home
+    :param homing:    (n,) if the ant is only heading home
+    :return np.array: (n, 8) movement weights
+    """
+    has_food = food > 0
+    weights = np.where(occupied | home | has_food, 0.0, pheromone)
+
+    # Any collectable food takes every other movement weight to 0
+    eligible = has_food & ~taboo & (carry < capacity)[:, None]
+    food_present = eligible.any(axis=1)
+    weights[food_present] = np.where(eligible[food_present], food[food_present], 0.0)
+
+    # Ants heading home only move to cells no further away
+    weights[homing] = (closer[homing] & (weights[homing] > 0)).astype(float)
+
+    # Ants carrying food next to home always go home
+    to_home = home & (carry > 0)[:, None]
+    going_home = to_home.any(axis=1)
+    weights[going_home] = 0.0
+    weights[going_home, to_home[going_home].argmax(axis=1)] = 1.0
+
+    return weights
+
+def apply_terrain(weights, allowed, cost):
+    """
+    Zeroes movements into blocked cells and divides the rest by the
+    cost of the cell moved into.
+    :param weights:   (n, 8) movement weights, updated in place
+    :param allowed:   (n, 8) if each movement is allowed
+    :param cost:      (n, 8) cost of each neighbour
+    :return np.array: (n, 8) movement weights
+    """
+    weights[~allowed] = 0.0
+    weights /= cost
+    return weights
+
+def sample_moves(weights, rng):
+    """
+    Draws one movement per ant, in the same way as random.choices with
+    the given weights.
+    :param weights:   (n, 8) movement weights
+    :param rng:       Random generator with a random(size) method
+    :return np.array: (n,) index into movements for each ant
+    :return np.array: (n,) if each ant has any valid move
+    """
+    cumulative = np.cumsum(weights, axis=1)
+    total = cumulative[:, -1]
+    draws = rng.random(len(weights)) * total
+    choices = np.minimum((cumulative <= draws[:, None]).sum(axis=1), weights.shape[1]-1)
+    return choices, total > 0
+
+def resolve_conflicts(targets, moving, shared):
+    """
+    Cancels moves so that no two ants land on the same cell. Where
+    several ants pick the same cell, the ant with the lowest index wins.
+    :param targets:   (n,) flat index of each ant's chosen cell
+    :param moving:    (n,) if each ant is moving, updated in place
+    :param shared:    (n,) if the chosen cell can hold several ants
+    :return np.array: (n,) if each ant is moving
+    """
+    exclusive = np.flatnonzero(moving & ~shared)
+    _, first = np.unique(targets[exclusive], return_index=True)
+    blocked = np.ones(len(exclusive), dtype=bool)
+    blocked[first] = False
+    moving[exclusive[blocked]] = False
+    return moving
@@ -0,0 +1,62 @@
+import time
+
+# Phases of a step, in the order they happen for each ant
+phases = ['movement', 'sampling', 'grids', 'food', 'pheromones']
+counters = ['moves', 'blocked', 'pickups', 'deliveries', 'taboo_hits']
+
+class Metrics:
+    def __init__(self, callback=None):
+        """
+        Per-phase timers and event counters for a simulation. The
+        simulation only touches this when metrics are enabled.
+        :param callback: Called with this object after every step
+        """
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all timers and counters.
+        """
+        self.times = dict.fromkeys(phases, 0.0)
+        self.counts = dict.fromkeys(counters, 0)
+        self.steps = 0
+        self.last_lap = time.perf_counter()
+
+    def start(self):
+        """
+        Starts timing from now, ignoring time since the last lap.
+        """
+        self.last_lap = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Adds the time since the last lap to a phase.
+        :param phase: Phase name
+        """
+        now = time.perf_counter()
+        self.times[phase] += now - self.last_lap
+        self.last_lap = now
+
+    def count(self, counter, amount=1):
+        """
+        Adds to an event counter.
+        :param counter: Counter name
+        :param amount:  Amount to add
+        """
+        self.counts[counter] += amount
+
+    def end_step(self):
+        """
+        Marks the end of a step, calling the callback if there is one.
+        """
+        self.steps += 1
+        if self.callback != None:
+            self.callback(self)
+
+    def summary(self):
+        """
+        Returns the timers and counters as a JSON-serialisable dictionary.
+        :return dict: Steps, phase times in seconds and event counts
+        """
+        return {'steps': self.steps, 'times': dict(self.times), 'counts': dict(self.counts)}
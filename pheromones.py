@@ -0,0 +1,216 @@
+import numpy as np
+from kernel import padded
+
+class PheromoneField:
+    def __init__(self, dimensions, evaporation_coefficient=0.02, deposit=1000.0, floor=1.0):
+        """
+        Dense pheromone field. Evaporation and clamping are applied to
+        the whole array at once, and deposits are scatter-added from
+        arrays of ant positions. Values are stored with a zero border so
+        neighbourhood gathers need no bounds checks.
+        :param dimensions:              Grid dimensions
+        :param evaporation_coefficient: Fraction evaporated per update
+        :param deposit:                 Pheromone laid by one ant
+        :param floor:                   Minimum pheromone value
+        """
+        self.dimensions = dimensions
+        self.evaporation_coefficient = evaporation_coefficient
+        self.deposit_amount = deposit
+        self.floor = floor
+        self.padded, self.values = padded(dimensions, float)
+        self.values[:] = floor
+
+    def evaporate(self, steps=1):
+        """
+        Evaporates the whole field, clamping values at the floor.
+        :param steps: Number of evaporation updates to apply
+        """
+        for _ in range(steps):
+            np.multiply(self.values, 1 - self.evaporation_coefficient, out=self.values)
+            np.maximum(self.values, self.floor, out=self.values)
+
+    def deposit(self, xs, ys):
+        """
+        Adds one deposit per position. Repeated positions receive
+        repeated deposits, applied in order.
+        :param xs: Array of x coordinates
+        :param ys: Array of y coordinates
+        """
+        np.add.at(self.values, (xs, ys), self.deposit_amount)
+
+    def gather(self, xs, ys):
+        """
+        Reads pheromone values, including cells one step outside the
+        grid, which read as 0.
+        :param xs:        Array of x coordinates
+        :param ys:        Array of y coordinates
+        :return np.array: Pheromone values
+        """
+        return self.padded[xs+1, ys+1]
+
+    def get(self, x, y):
+        """
+        Reads a single pheromone value.
+        :param x:      x coordinate
+        :param y:      y coordinate
+        :return float: Pheromone value
+        """
+        return self.values[x, y]
+
+    def state(self):
+        """
+        Returns the arrays needed to restore the field.
+        :return dict: Dictionary of name to NumPy array
+        """
+        return {'pheromones': self.values}
+
+    def restore(self, arrays):
+        """
+        Restores the field from arrays returned by state.
+        :param arrays: Dictionary of name to NumPy array
+        """
+        self.values[:] = arrays['pheromones']
+
+class SparsePheromoneField:
+    def __init__(self, dimensions, evaporation_coefficient=0.02, deposit=1000.0, floor=1.0, prune_interval=64):
+        """
+        Sparse pheromone field, only storing cells above the floor.
+        Evaporation just advances a clock. Each stored cell keeps the
+        value and clock time of its last deposit, and its current value
+        is found in closed form when read, so it matches the dense field
+        up to floating point rounding.
+        :param dimensions:              Grid dimensions
+        :param evaporation_coefficient: Fraction evaporated per update
+        :param deposit:                 Pheromone laid by one ant
+        :param floor:                   Minimum pheromone value
+        :param prune_interval:          Updates between dropping cells back at the floor
+        """
+        self.dimensions = dimensions
+        self.evaporation_coefficient = evaporation_coefficient
+        self.deposit_amount = deposit
+        self.floor = floor
+        self.prune_interval = prune_interval
+        self.clock = 0
+
+        # Sorted flat cell ids, with the value and clock time of each
+        # cell's last update
+        self.cells = np.empty(0, dtype=np.int64)
+        self.stored = np.empty(0, dtype=float)
+        self.stamps = np.empty(0, dtype=np.int64)
+
+    def evaporate(self, steps=1):
+        """
+        Evaporates the whole field. Values are only updated when read.
+        :param steps: Number of evaporation updates to apply
+        """
+        for _ in range(steps):
+            self.clock += 1
+            if self.clock % self.prune_interval == 0:
+                self.prune()
+
+    def current(self, positions):
+        """
+        Finds the current value of stored cells.
+        :param positions: Positions in the stored arrays
+        :return np.array: Current values
+        """
+        decay = (1 - self.evaporation_coefficient) ** (self.clock - self.stamps[positions])
+        return np.maximum(self.stored[positions] * decay, self.floor)
+
+    def find(self, cells):
+        """
+        Looks up flat cell ids in the stored cells.
+        :param cells:     Array of flat cell ids
+        :return np.array: Position of each cell in the stored arrays
+        :return np.array: If each cell is stored
+        """
+        positions = np.minimum(np.searchsorted(self.cells, cells), max(len(self.cells)-1, 0))
+        if len(self.cells) == 0:
+            return positions, np.zeros(np.shape(cells), dtype=bool)
+        return positions, self.cells[positions] == cells
+
+    def deposit(self, xs, ys):
+        """
+        Adds one deposit per position. Repeated positions receive
+        repeated deposits.
+        :param xs: Array of x coordinates
+        :param ys: Array of y coordinates
+        """
+        cells, counts = np.unique(np.asarray(xs, dtype=np.int64)*self.dimensions[1] + ys, return_counts=True)
+        positions, found = self.find(cells)
+
+        existing = positions[found]
+        self.stored[existing] = self.current(existing) + counts[found]*self.deposit_amount
+        self.stamps[existing] = self.clock
+
+        new_cells = cells[~found]
+        if len(new_cells) > 0:
+            insert_at = np.searchsorted(self.cells, new_cells)
+            self.cells = np.insert(self.cells, insert_at, new_cells)
+            self.stored = np.insert(self.stored, insert_at, self.floor + counts[~found]*self.deposit_amount)
+            self.stamps = np.insert(self.stamps, insert_at, self.clock)
+
+    def prune(self):
+        """
+        Drops stored cells that have evaporated back to the floor.
+        """
+        active = self.current(np.arange(len(self.cells))) > self.floor
+        self.cells, self.stored, self.stamps = self.cells[active], self.stored[active], self.stamps[active]
+
+    def gather(self, xs, ys):
+        """
+        Reads pheromone values, including cells one step outside the
+        grid, which read as 0.
+        :param xs:        Array of x coordinates
+        :param ys:        Array of y coordinates
+        :return np.array: Pheromone values
+        """
+        inside = (xs >= 0) & (xs < self.dimensions[0]) & (ys >= 0) & (ys < self.dimensions[1])
+        positions, found = self.find(np.asarray(xs, dtype=np.int64)*self.dimensions[1] + ys)
+        values = np.full(np.shape(xs), self.floor)
+        values[found] = self.current(positions[found])
+        values[~inside] = 0.0
+        return values
+
+    def get(self, x, y):
+        """
+        Reads a single pheromone value.
+        :param x:      x coordinate
+        :param y:      y coordinate
+        :return float: Pheromone value
+        """
+        return self.gather(np.array([x]), np.array([y]))[0]
+
+    @property
+    def values(self):
+        """
+        Builds a dense copy of the field.
+        :return np.array: Numpy array of pheromone values
+        """
+        values = np.full(self.dimensions, self.floor)
+        values.flat[self.cells] = self.current(np.arange(len(self.cells)))
+        return values
+
+    def state(self):
+        """
+        Returns the arrays needed to restore the field.
+        :return dict: Dictionary of name to NumPy array
+        """
+        return {'pheromone_cells': self.cells, 'pheromone_values': self.current(np.arange(len(self.cells))),
+                'pheromone_stored': self.stored, 'pheromone_stamps': self.stamps, 'pheromone_clock': np.array([self.clock])}
+
+    def restore(self, arrays):
+        """
+        Restores the field from arrays returned by state.
+        :param arrays: Dictionary of name to NumPy array
+        """
+        self.cells = np.array(arrays['pheromone_cells'], dtype=np.int64)
+        if 'pheromone_stamps' in arrays:
+            # Stored values and stamps as they were, so later reads round
+            # exactly as they would have without the checkpoint
+            self.stored = np.array(arrays['pheromone_stored'], dtype=float)
+            self.stamps = np.array(arrays['pheromone_stamps'], dtype=np.int64)
+            self.clock = int(arrays['pheromone_clock'][0])
+        else:
+            self.stored = np.array(arrays['pheromone_values'], dtype=float)
+            self.stamps = np.full(len(self.cells), self.clock, dtype=np.int64)
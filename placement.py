@@ -0,0 +1,136 @@
+import os
+import json
+import numpy as np
+
+strategies = ['uniform', 'clustered', 'ring', 'file', 'sequential']
+
+def place_food(strategy, dimensions, no_food, rng, free, nests, **options):
+    """
+    Chooses distinct cells for food sources.
+    'uniform' draws every cell at once without replacement.
+    'clustered' draws cells around randomly placed cluster centres.
+    'ring' draws cells at a set distance from any nest.
+    'file' reads cells from a .npy, .json or comma separated text file.
+    'sequential' draws one cell at a time, as in earlier versions, so
+    seeded runs made before can be replayed.
+    :param strategy:   Placement strategy, one of strategies
+    :param dimensions: Grid dimensions
+    :param no_food:    Number of food sources
+    :param rng:        NumPy generator
+    :param free:       Boolean array of cells food can be placed on
+    :param nests:      List of nest coordinates
+    :param options:    Strategy options:
+                       clustered: clusters (default 3), spread (default 2.0)
+                       ring: radius (default a quarter of the grid), width (default 1.0)
+                       file: path
+    :return np.array:  (no_food, 2) int32 food coordinates
+    """
+    if strategy not in strategies:
+        raise ValueError("food placement must be one of "+", ".join(strategies))
+    if strategy == 'sequential':
+        return sequential(dimensions, no_food, rng, free)
+    if strategy == 'file':
+        return from_file(options['path'], no_food, free)
+    if strategy == 'clustered':
+        return clustered(dimensions, no_food, rng, free, options.get('clusters', 3), options.get('spread', 2.0))
+
+    if strategy == 'ring':
+        free = free & ring(dimensions, nests, options.get('radius', min(dimensions)/4), options.get('width', 1.0))
+    cells = np.flatnonzero(free)
+    if len(cells) < no_food:
+        raise ValueError("not enough free cells to place "+str(no_food)+" food")
+
+    chosen = rng.choice(len(cells), size=no_food, replace=False)
+    return to_coordinates(cells[chosen], dimensions)
+
+def ring(dimensions, nests, radius, width):
+    """
+    Marks cells within width/2 of radius from any nest, only measuring
+    cells in the square around each nest.
+    :return np.array: Boolean array of ring cells
+    """
+    cells = np.zeros(dimensions, dtype=bool)
+    reach = radius + width/2
+    for x, y in nests:
+        x0, x1 = max(int(np.floor(x-reach)), 0), min(int(np.ceil(x+reach))+1, dimensions[0])
+        y0, y1 = max(int(np.floor(y-reach)), 0), min(int(np.ceil(y+reach))+1, dimensions[1])
+        distance = np.hypot(np.arange(x0, x1)[:, None]-x, np.arange(y0, y1)[None, :]-y)
+        cells[x0:x1, y0:y1] |= np.abs(distance-radius) <= width/2
+    return cells
+
+def to_coordinates(cells, dimensions):
+    xs, ys = np.divmod(cells, dimensions[1])
+    return np.stack([xs, ys], axis=1).astype(np.int32)
+
+def sequential(dimensions, no_food, rng, free):
+    """
+    Draws cells one at a time, skipping cells already used or not free.
+    """
+    if no_food > int(free.sum()):
+        raise ValueError("not enough free cells to place "+str(no_food)+" food")
+    used = set()
+    food_coors = []
+    while len(food_coors) < no_food:
+        coors = (int(rng.integers(dimensions[0])), int(rng.integers(dimensions[1])))
+        if coors not in used and free[coors]:
+            used.add(coors)
+            food_coors.append(coors)
+    return np.array(food_coors, dtype=np.int32).reshape(-1, 2)
+
+def clustered(dimensions, no_food, rng, free, clusters, spread, max_rounds=100):
+    """
+    Draws cells from normal distributions around cluster centres, in
+    batches, keeping the first draw of each free cell. Anything still
+    missing after max_rounds batches is placed uniformly.
+    """
+    cells = np.flatnonzero(free)
+    if len(cells) < no_food:
+        raise ValueError("not enough free cells to place "+str(no_food)+" food")
+    centres = to_coordinates(cells[rng.choice(len(cells), size=min(clusters, len(cells)), replace=False)], dimensions)
+
+    available = free.ravel().copy()
+    chosen = []
+    remaining = no_food
+    for _ in range(max_rounds):
+        if remaining == 0:
+            break
+        batch = 2*remaining
+        points = centres[rng.integers(len(centres), size=batch)] + np.rint(rng.normal(0, spread, size=(batch, 2))).astype(int)
+        inside = (points[:, 0] >= 0) & (points[:, 0] < dimensions[0]) & (points[:, 1] >= 0) & (points[:, 1] < dimensions[1])
+        candidates = points[inside, 0]*dimensions[1] + points[inside, 1]
+        candidates = candidates[available[candidates]]
+        _, first = np.unique(candidates, return_index=True)
+        candidates = candidates[np.sort(first)][:remaining]
+        available[candidates] = False
+        chosen.append(candidates)
+        remaining -= len(candidates)
+
+    if remaining > 0:
+        left = np.flatnonzero(available)
+        chosen.append(left[rng.choice(len(left), size=remaining, replace=False)])
+    return to_coordinates(np.concatenate(chosen), dimensions)
+
+def from_file(path, no_food, free):
+    """
+    Reads food cells from a file, using the first no_food of them.
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.npy':
+        coors = np.load(path)
+    elif extension == '.json':
+        with open(path) as coors_file:
+            coors = np.array(json.load(coors_file))
+    else:
+        coors = np.loadtxt(path, delimiter=',', ndmin=2)
+    coors = np.asarray(coors, dtype=np.int32).reshape(-1, 2)
+
+    if len(coors) < no_food:
+        raise ValueError(path+" has "+str(len(coors))+" food cells, "+str(no_food)+" needed")
+    coors = coors[:no_food]
+    if ((coors < 0) | (coors >= free.shape)).any():
+        raise ValueError(path+" has food cells outside the grid")
+    if not free[coors[:, 0], coors[:, 1]].all():
+        raise ValueError(path+" has food on a nest or blocked cell")
+    if len(np.unique(coors, axis=0)) < len(coors):
+        raise ValueError(path+" has repeated food cells")
+    return coors
@@ -0,0 +1,247 @@
+import os
+import json
+import queue
+import threading
+import numpy as np
+
+class TrajectoryRecorder:
+    def __init__(self, path, simulation, chunk_size=256, max_pending=4, pheromones=True):
+        """
+        Streams every step of a simulation to a directory of compressed
+        chunks. Frames are buffered in memory one chunk at a time, then
+        delta-encoded, compressed and written by a background thread.
+        Recording starts with the current state as frame 0, and a frame
+        is added on every aco.increment until close is called.
+        :param path:        Directory to write the trajectory to
+        :param simulation:  aco object to record
+        :param chunk_size:  Frames per chunk file
+        :param max_pending: Chunks waiting to be written before recording blocks
+        :param pheromones:  Records the pheromone field in every frame
+        """
+        self.path = path
+        self.simulation = simulation
+        self.chunk_size = chunk_size
+        self.pheromones = pheromones
+        self.no_food = simulation.ants.taboo.shape[1]
+        self.frames = []
+        self.chunks = 0
+        self.error = None
+
+        os.makedirs(path, exist_ok=True)
+        food = simulation.food
+        food_locations = np.where(food.active[:, None], food.locations, -1)
+        with open(os.path.join(path, 'meta.json'), 'w') as meta_file:
+            json.dump({
+                'dimensions': list(simulation.dimensions),
+                'no_ants': len(simulation.ants),
+                'no_food': self.no_food,
+                'food_locations': food_locations.tolist(),
+                'start_step': simulation.steps,
+                'chunk_size': chunk_size,
+                'pheromones': pheromones,
+                'params': simulation.params
+            }, meta_file)
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+        self.record(simulation)
+        simulation.recorder = self
+
+    def record(self, simulation):
+        """
+        Adds a frame for the current state. Called by aco.increment.
+        :param simulation: Recorded aco object
+        """
+        if self.error != None:
+            raise self.error
+
+        frame = {
+            'ant_locations': simulation.ants.locations.copy(),
+            'carry': simulation.ants.carry.copy(),
+            'food_values': simulation.food.values.copy(),
+            'brought_food': simulation.brought_food
+        }
+        if self.pheromones:
+            frame['pheromones'] = simulation.pheromones.copy()
+        self.frames.append(frame)
+
+        if len(self.frames) == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the buffered frames to the writer thread, waiting if too
+        many chunks are already queued.
+        """
+        if len(self.frames) > 0:
+            self.pending.put((self.chunks, self.frames))
+            self.chunks += 1
+            self.frames = []
+
+    def close(self):
+        """
+        Stops recording, then waits for every chunk to be written.
+        """
+        if self.simulation.recorder is self:
+            self.simulation.recorder = None
+        self.flush()
+        self.pending.put(None)
+        self.writer.join()
+        if self.error != None:
+            raise self.error
+
+    def write_chunks(self):
+        """
+        Writer thread loop, encoding and writing queued chunks.
+        """
+        while True:
+            item = self.pending.get()
+            if item == None:
+                return
+            if self.error != None:
+                continue
+            try:
+                index, frames = item
+                np.savez_compressed(chunk_path(self.path, index), **encode_chunk(frames))
+            except Exception as error:
+                self.error = error
+
+def chunk_path(path, index):
+    return os.path.join(path, "chunk_%06d.npz" % index)
+
+def encode_chunk(frames):
+    """
+    Encodes a chunk of frames. Ant locations and carry are stored as the
+    first frame plus per-step differences, which are small and mostly
+    repeated. Food values are stored as the first frame plus a sparse
+    list of changes.
+    :param frames: List of frame dictionaries
+    :return dict:  Dictionary of arrays to save
+    """
+    locations = np.stack([frame['ant_locations'] for frame in frames])
+    carry = np.stack([frame['carry'] for frame in frames])
+    food_values = np.stack([frame['food_values'] for frame in frames])
+    moves = np.diff(locations, axis=0)
+    if moves.size > 0 and np.abs(moves).max() > 127:
+        raise ValueError("ants moved too far between recorded frames")
+
+    food_frames, food_indexes = np.nonzero(np.diff(food_values, axis=0))
+    arrays = {
+        'length': np.array(len(frames)),
+        'ant_locations': locations[0],
+        'ant_moves': moves.astype(np.int8),
+        'carry': carry[0],
+        'carry_changes': np.diff(carry, axis=0).astype(np.int32),
+        'food_values': food_values[0],
+        'food_change_frames': food_frames.astype(np.int32)+1,
+        'food_change_indexes': food_indexes.astype(np.int32),
+        'food_change_values': food_values[food_frames+1, food_indexes],
+        'brought_food': np.array([frame['brought_food'] for frame in frames], dtype=np.int64)
+    }
+    if 'pheromones' in frames[0]:
+        arrays['pheromones'] = np.stack([frame['pheromones'] for frame in frames])
+    return arrays
+
+class Frame:
+    def __init__(self, step, ant_locations, carry, food_values, brought_food, pheromones):
+        """
+        A single recorded step.
+        :param step:          Simulation step
+        :param ant_locations: (ants, 2) ant coordinates
+        :param carry:         (ants,) food carried by each ant
+        :param food_values:   (food,) food left in each source, by Food.index
+        :param brought_food:  Food brought home so far
+        :param pheromones:    Pheromone field, or None if not recorded
+        """
+        self.step = step
+        self.ant_locations = ant_locations
+        self.carry = carry
+        self.food_values = food_values
+        self.brought_food = brought_food
+        self.pheromones = pheromones
+
+class TrajectoryReader:
+    def __init__(self, path):
+        """
+        Lazy reader for a recorded trajectory. Only the chunk holding the
+        requested frame is loaded and decoded.
+        :param path: Trajectory directory
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        self.chunk_size = self.meta['chunk_size']
+        self.start_step = self.meta['start_step']
+        self.food_locations = np.array(self.meta['food_locations'])
+
+        self.chunks = 0
+        while os.path.exists(chunk_path(path, self.chunks)):
+            self.chunks += 1
+        self.cached_index = None
+
+        if self.chunks == 0:
+            self.frames = 0
+        else:
+            with np.load(chunk_path(path, self.chunks-1)) as last_chunk:
+                self.frames = (self.chunks-1)*self.chunk_size + int(last_chunk['length'])
+
+    def __len__(self):
+        return self.frames
+
+    def __getitem__(self, frame):
+        """
+        Reads one frame.
+        :param frame: Frame number, 0 being the state when recording began
+        :return Frame: Decoded frame
+        """
+        if frame < 0:
+            frame += self.frames
+        if frame < 0 or frame >= self.frames:
+            raise IndexError("frame out of range")
+
+        chunk = self.load_chunk(frame // self.chunk_size)
+        offset = frame % self.chunk_size
+        pheromones = chunk['pheromones'][offset] if 'pheromones' in chunk else None
+        return Frame(self.start_step+frame, chunk['ant_locations'][offset], chunk['carry'][offset],
+                     chunk['food_values'][offset], int(chunk['brought_food'][offset]), pheromones)
+
+    def __iter__(self):
+        for frame in range(self.frames):
+            yield self[frame]
+
+    def load_chunk(self, index):
+        """
+        Loads and decodes a chunk, keeping the most recent one cached.
+        :param index: Chunk number
+        :return dict: Decoded arrays, with one entry per frame
+        """
+        if self.cached_index == index:
+            return self.cached_chunk
+
+        with np.load(chunk_path(self.path, index)) as data:
+            chunk = {key: data[key] for key in data.files}
+
+        length = int(chunk['length'])
+        locations = np.empty((length,)+chunk['ant_locations'].shape, dtype=chunk['ant_locations'].dtype)
+        locations[0] = chunk['ant_locations']
+        np.cumsum(chunk['ant_moves'], axis=0, out=locations[1:])
+        locations[1:] += chunk['ant_locations']
+
+        carry = np.empty((length,)+chunk['carry'].shape, dtype=chunk['carry'].dtype)
+        carry[0] = chunk['carry']
+        np.cumsum(chunk['carry_changes'], axis=0, out=carry[1:])
+        carry[1:] += chunk['carry']
+
+        food_values = np.repeat(chunk['food_values'][None, :], length, axis=0)
+        for frame, food_index, value in zip(chunk['food_change_frames'], chunk['food_change_indexes'], chunk['food_change_values']):
+            food_values[frame:, food_index] = value
+
+        decoded = {'ant_locations': locations, 'carry': carry, 'food_values': food_values, 'brought_food': chunk['brought_food']}
+        if 'pheromones' in chunk:
+            decoded['pheromones'] = chunk['pheromones']
+
+        self.cached_index = index
+        self.cached_chunk = decoded
+        return decoded
@@ -0,0 +1,165 @@
+import numpy as np
+import tkinter as tk
+from worker import Snapshot
+
+pheromone_colours = [(255, 255, 255), (0, 0, 0)]
+food_colours = [(184, 232, 182), (55, 144, 52)]
+home_colour = (0, 0, 255)
+wall_colour = (96, 96, 96)
+
+def hex_to_rgb(colour):
+    """
+    Converts a hex colour code to an RGB tuple.
+    :param colour: Hex code, such as '#FF0000'
+    :return (int): Red, green and blue values
+    """
+    colour = colour.lstrip('#')
+    return tuple(int(colour[i:i+2], 16) for i in (0, 2, 4))
+
+class ColourMap:
+    def __init__(self, colours, size=256):
+        """
+        Precomputed lookup table interpolating between two colours, a
+        vectorized version of app.get_colour.
+        :param colours: List of 2 colours to interpolate between
+        :param size:    Number of entries in the table
+        """
+        start_colour, end_colour = np.array(colours[0], dtype=float), np.array(colours[1], dtype=float)
+        progress = np.linspace(0, 1, size)[:, None]
+        self.lut = np.rint(start_colour + (end_colour - start_colour) * progress).astype(np.uint8)
+
+    def map(self, progress):
+        """
+        Maps an array of progress values to colours. Values outside
+        0 <= x <= 1 are black, as with app.get_colour.
+        :param progress:  Array of values to map
+        :return np.array: Array of RGB values, with a trailing axis of 3
+        """
+        valid = (progress >= 0) & (progress <= 1)
+        index = np.rint(np.where(valid, progress, 0) * (len(self.lut)-1)).astype(np.intp)
+        colours = self.lut[index]
+        colours[~valid] = 0
+        return colours
+
+def render_layers(pheromones, ant_locations, ant_colours, home_grid, food_locations, food_fill, pheromone_map, food_map, blocked=None):
+    """
+    Draws pheromone, ant, home and food layers into one RGB buffer, with
+    one pixel per cell. Later layers are drawn over earlier ones.
+    :param pheromones:     Pheromone array
+    :param ant_locations:  (ants, 2) array of ant coordinates
+    :param ant_colours:    (ants, 3) array of ant RGB colours
+    :param home_grid:      Boolean array of home cells
+    :param food_locations: (food, 2) array of food coordinates
+    :param food_fill:      (food,) fraction of each food source left
+    :param pheromone_map:  ColourMap for pheromone values
+    :param food_map:       ColourMap for food sources
+    :param blocked:        Boolean array of wall cells, or None
+    :return np.array:      (rows, columns, 3) RGB buffer
+    """
+    rgb = pheromone_map.map((pheromones-1)/50)
+    if blocked is not None:
+        rgb[blocked] = wall_colour
+    if len(ant_locations) > 0:
+        rgb[ant_locations[:, 0], ant_locations[:, 1]] = ant_colours
+    rgb[home_grid] = home_colour
+    if len(food_locations) > 0:
+        rgb[food_locations[:, 0], food_locations[:, 1]] = food_map.map(food_fill)
+    return rgb
+
+def dirty_rectangles(changed, tile=16):
+    """
+    Groups changed cells into rectangles made of whole tiles, merging
+    neighbouring dirty tiles in the same tile row.
+    :param changed: Boolean array of changed cells
+    :param tile:    Tile size in cells
+    :return [(int)]: (row, column, end row, end column) of each rectangle
+    """
+    rows, columns = changed.shape
+    tile_rows, tile_columns = -(-rows // tile), -(-columns // tile)
+    padded = np.zeros((tile_rows*tile, tile_columns*tile), dtype=bool)
+    padded[:rows, :columns] = changed
+    dirty = padded.reshape(tile_rows, tile, tile_columns, tile).any(axis=(1, 3))
+
+    rectangles = []
+    for tile_row in np.flatnonzero(dirty.any(axis=1)).tolist():
+        # Start and end of each run of dirty tiles in the row
+        edges = np.diff(np.concatenate(([0], dirty[tile_row].astype(np.int8), [0])))
+        for start, end in zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()):
+            rectangles.append((tile_row*tile, start*tile, min((tile_row+1)*tile, rows), min(end*tile, columns)))
+    return rectangles
+
+def to_ppm(rgb, cell_size=1):
+    """
+    Encodes an RGB buffer as binary PPM data, scaling each cell up to a
+    square of pixels.
+    :param rgb:       (rows, columns, 3) RGB buffer
+    :param cell_size: Pixels per cell side
+    :return bytes:    PPM image data
+    """
+    if cell_size > 1:
+        rgb = np.repeat(np.repeat(rgb, cell_size, axis=0), cell_size, axis=1)
+    header = ("P6 "+str(rgb.shape[1])+" "+str(rgb.shape[0])+" 255 ").encode()
+    return header + np.ascontiguousarray(rgb).tobytes()
+
+class CanvasRenderer:
+    def __init__(self, master, dimensions, cell_size=10, tile=16):
+        """
+        Draws the simulation onto a single Canvas image, only updating
+        the parts of the image that changed since the last frame.
+        :param master:     Tkinter parent widget
+        :param dimensions: Grid dimensions
+        :param cell_size:  Pixels per cell side
+        :param tile:       Dirty rectangle tile size in cells
+        """
+        self.dimensions = dimensions
+        self.cell_size = cell_size
+        self.tile = tile
+        self.pheromone_map = ColourMap(pheromone_colours)
+        self.food_map = ColourMap(food_colours)
+        self.previous = None
+        self.palette_source = None
+
+        width, height = dimensions[1]*cell_size, dimensions[0]*cell_size
+        self.canvas = tk.Canvas(master=master, width=width, height=height, highlightthickness=0)
+        self.image = tk.PhotoImage(master=master, width=width, height=height)
+        self.canvas.create_image(0, 0, image=self.image, anchor=tk.NW)
+
+    def draw(self, rgb):
+        """
+        Blits an RGB buffer to the canvas image. Only dirty rectangles
+        are sent to Tk, unless most of the frame has changed.
+        :param rgb: (rows, columns, 3) RGB buffer
+        """
+        if self.previous is None:
+            rectangles = [(0, 0, rgb.shape[0], rgb.shape[1])]
+        else:
+            changed = (rgb != self.previous).any(axis=2)
+            if changed.mean() > 0.5:
+                rectangles = [(0, 0, rgb.shape[0], rgb.shape[1])]
+            else:
+                rectangles = dirty_rectangles(changed, self.tile)
+
+        for row, column, end_row, end_column in rectangles:
+            data = to_ppm(rgb[row:end_row, column:end_column], self.cell_size)
+            self.image.put(data, to=(column*self.cell_size, row*self.cell_size))
+        self.previous = rgb
+
+    def draw_snapshot(self, snapshot):
+        """
+        Renders a simulation snapshot.
+        :param snapshot: Snapshot to draw
+        """
+        if self.palette_source != snapshot.colours:
+            self.palette = np.array([hex_to_rgb(colour) for colour in snapshot.colours], dtype=np.uint8)
+            self.palette_source = snapshot.colours
+
+        self.draw(render_layers(snapshot.pheromones, snapshot.ant_locations, self.palette[snapshot.ant_colour_index],
+                                snapshot.home_grid, snapshot.food_locations, snapshot.food_fill,
+                                self.pheromone_map, self.food_map, snapshot.blocked))
+
+    def draw_aco(self, simulation):
+        """
+        Renders the current state of a simulation.
+        :param simulation: aco object to draw
+        """
+        self.draw_snapshot(Snapshot(simulation))
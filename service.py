@@ -0,0 +1,371 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import multiprocessing
+from aco import aco, RunResult
+from cache import ResultCache, run_key
+
+def run_worker(connection, cache_directory=None):
+    """
+    Worker process loop, running simulations sent by a SimulationService.
+    The process stays up between runs, so imports and NumPy start-up are
+    only paid once. Commands are checked between steps, so a run can be
+    cancelled part way through.
+    :param connection:      Pipe to the parent process
+    :param cache_directory: ResultCache directory, or None
+    """
+    cache = ResultCache(cache_directory) if cache_directory != None else None
+    while True:
+        command, payload = connection.recv()
+        if command == 'end':
+            return
+        if command != 'run':
+            # Cancels for runs that already finished
+            continue
+
+        job_id, request = payload
+        try:
+            message = run_job(connection, job_id, request, cache)
+        except Exception as error:
+            message = ('error', (job_id, str(error)))
+        if message[0] == 'end':
+            return
+        connection.send(message)
+
+def run_job(connection, job_id, request, cache):
+    """
+    Runs one simulation for run_worker, sending progress every
+    progress_every steps.
+    :return tuple: Final message for the parent, or ('end', None) if the
+                   worker was told to stop
+    """
+    params = dict(request.get('params', {}), seed=request.get('seed'))
+    max_steps = request.get('max_steps')
+    until_finished = request.get('until_finished', True)
+    progress_every = request.get('progress_every', 10)
+    if max_steps == None and not until_finished:
+        raise ValueError("run needs max_steps when until_finished is False")
+
+    key = run_key(params, max_steps, until_finished) if cache != None else None
+    if key != None:
+        result = cache.get(key)
+        if result != None:
+            return ('result', (job_id, result.to_dict(), True))
+
+    simulation = aco(**params)
+    steps = 0
+    start = time.perf_counter()
+    while max_steps == None or steps < max_steps:
+        if until_finished and simulation.is_finished():
+            break
+        food_left = simulation.increment()
+        steps += 1
+        if progress_every != None and steps % progress_every == 0:
+            connection.send(('progress', (job_id, simulation.steps, simulation.brought_food, food_left)))
+        while connection.poll():
+            command, payload = connection.recv()
+            if command == 'end':
+                return ('end', None)
+            if command == 'cancel' and payload == job_id:
+                return ('cancelled', (job_id, simulation.steps))
+    elapsed = time.perf_counter() - start
+
+    result = RunResult(steps, len(simulation.ants), simulation.brought_food, simulation.food_left(),
+                       simulation.is_finished(), elapsed, simulation.seed)
+    if key != None:
+        cache.put(key, result, simulation)
+    return ('result', (job_id, result.to_dict(), False))
+
+class Job:
+    def __init__(self, job_id, client, client_id, request):
+        """
+        A run requested by a client.
+        :param job_id:    Run id used between the service and workers
+        :param client:    Client the run belongs to
+        :param client_id: Run id chosen by the client
+        :param request:   Run request
+        """
+        self.job_id = job_id
+        self.client = client
+        self.client_id = client_id
+        self.request = request
+        self.worker = None
+        self.cancelled = False
+        self.done = False
+
+class Client:
+    def __init__(self, writer, max_buffer):
+        """
+        Connection to a client, sending one JSON message per line.
+        Progress updates are dropped while the client is not reading, as
+        only the latest matters, but results are always sent.
+        :param writer:     asyncio stream writer
+        :param max_buffer: Bytes waiting to be sent above which progress
+                           updates are dropped
+        """
+        self.writer = writer
+        self.max_buffer = max_buffer
+        self.jobs = {}
+        self.closed = False
+
+    def send(self, message, droppable=False):
+        if self.closed or self.writer.is_closing():
+            return
+        if droppable and self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            return
+        self.writer.write((json.dumps(message)+"\n").encode())
+
+class SimulationService:
+    def __init__(self, workers=None, max_pending=64, cache_directory=None, max_buffer=1 << 16):
+        """
+        Runs simulations for clients connected over a local socket. Runs
+        are queued and handed to a fixed pool of warm worker processes.
+        Once max_pending runs are queued, the service stops reading from
+        clients that send more, so they are held back by the socket.
+        :param workers:         Worker processes, defaults to CPU count
+        :param max_pending:     Runs queued before clients are held back
+        :param cache_directory: ResultCache directory shared by the
+                                workers, or None
+        :param max_buffer:      Bytes waiting to be sent to a client above
+                                which its progress updates are dropped
+        """
+        self.no_workers = workers if workers != None else (os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.cache_directory = cache_directory
+        self.max_buffer = max_buffer
+        self.context = multiprocessing.get_context()
+        self.job_ids = itertools.count()
+        self.jobs = {}
+        self.workers = []
+        self.clients = {}
+        self.server = None
+
+    async def start(self, path=None, host='127.0.0.1', port=None):
+        """
+        Starts the worker processes and listens for clients.
+        :param path: Unix socket path, or None to listen on TCP
+        :param host: TCP host
+        :param port: TCP port, 0 picks a free port
+        :return asyncio.Server: Listening server
+        """
+        self.loop = asyncio.get_running_loop()
+        self.pending = asyncio.Queue(maxsize=self.max_pending)
+        self.idle = asyncio.Queue()
+        for _ in range(self.no_workers):
+            self.start_worker()
+        self.dispatcher = asyncio.ensure_future(self.dispatch())
+
+        if path != None:
+            self.server = await asyncio.start_unix_server(self.handle_client, path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    def start_worker(self):
+        parent_connection, child_connection = self.context.Pipe()
+        process = self.context.Process(target=run_worker, args=(child_connection, self.cache_directory), daemon=True)
+        process.start()
+        child_connection.close()
+
+        worker = {'process': process, 'connection': parent_connection, 'job': None}
+        self.workers.append(worker)
+        self.loop.add_reader(parent_connection.fileno(), self.receive, worker)
+        self.idle.put_nowait(worker)
+
+    async def dispatch(self):
+        """
+        Hands queued runs to idle workers, in the order they arrived.
+        """
+        while True:
+            job = await self.pending.get()
+            if job.cancelled:
+                continue
+            worker = await self.idle.get()
+            if job.cancelled or worker not in self.workers:
+                if worker in self.workers:
+                    self.idle.put_nowait(worker)
+                continue
+            job.worker = worker
+            worker['job'] = job
+            worker['connection'].send(('run', (job.job_id, job.request)))
+            job.client.send({'type': 'started', 'id': job.client_id})
+
+    def receive(self, worker):
+        """
+        Forwards messages from a worker to the client of its run.
+        :param worker: Worker with messages waiting
+        """
+        connection = worker['connection']
+        try:
+            while connection.poll():
+                command, payload = connection.recv()
+                job = self.jobs.get(payload[0])
+                if command == 'progress':
+                    if job != None and not job.cancelled:
+                        job.client.send({'type': 'progress', 'id': job.client_id, 'step': payload[1],
+                                         'brought_food': payload[2], 'food_left': payload[3]}, droppable=True)
+                    continue
+
+                if job != None:
+                    if command == 'result':
+                        job.client.send({'type': 'result', 'id': job.client_id, 'result': payload[1], 'cached': payload[2]})
+                    elif command == 'cancelled':
+                        job.client.send({'type': 'cancelled', 'id': job.client_id, 'step': payload[1]})
+                    else:
+                        job.client.send({'type': 'error', 'id': job.client_id, 'error': payload[1]})
+                    self.finish(job)
+                worker['job'] = None
+                self.idle.put_nowait(worker)
+        except (EOFError, OSError):
+            self.replace_worker(worker)
+
+    def replace_worker(self, worker):
+        """
+        Replaces a worker process that exited, failing its run.
+        :param worker: Worker that exited
+        """
+        self.loop.remove_reader(worker['connection'].fileno())
+        worker['connection'].close()
+        self.workers.remove(worker)
+        job = worker['job']
+        if job != None:
+            job.client.send({'type': 'error', 'id': job.client_id, 'error': "worker process exited"})
+            self.finish(job)
+        self.start_worker()
+
+    def finish(self, job):
+        job.done = True
+        self.jobs.pop(job.job_id, None)
+        if job.client.jobs.get(job.client_id) is job:
+            del job.client.jobs[job.client_id]
+
+    def cancel(self, job):
+        """
+        Cancels a run. Queued runs are dropped, running runs are stopped
+        by their worker at the next step.
+        :param job: Job to cancel
+        """
+        if job.done or job.cancelled:
+            return
+        job.cancelled = True
+        if job.worker != None:
+            job.worker['connection'].send(('cancel', job.job_id))
+        else:
+            job.client.send({'type': 'cancelled', 'id': job.client_id, 'step': 0})
+            self.finish(job)
+
+    async def handle_client(self, reader, writer):
+        """
+        Reads requests from a client, one JSON object per line:
+        {"type": "run", "id": ..., "params": {...}, "seed": ...,
+         "max_steps": ..., "progress_every": ...} and
+        {"type": "cancel", "id": ...}. Runs the client still has are
+        cancelled when it disconnects.
+        """
+        client = Client(writer, self.max_buffer)
+        self.clients[client] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if line == b'':
+                    break
+                try:
+                    request = json.loads(line)
+                    kind = request['type']
+                except (ValueError, KeyError, TypeError):
+                    client.send({'type': 'error', 'error': "requests must be JSON objects with a type"})
+                    continue
+
+                client_id = request.get('id')
+                if not isinstance(client_id, (str, int, type(None))):
+                    client.send({'type': 'error', 'error': "run ids must be strings, integers or null"})
+                    continue
+                if kind == 'run':
+                    if client_id in client.jobs:
+                        client.send({'type': 'error', 'id': client_id, 'error': "run id already in use"})
+                        continue
+                    job = Job(next(self.job_ids), client, client_id, request)
+                    self.jobs[job.job_id] = job
+                    client.jobs[client_id] = job
+                    # Waits here while the queue is full
+                    await self.pending.put(job)
+                    client.send({'type': 'accepted', 'id': client_id})
+                elif kind == 'cancel':
+                    if client_id in client.jobs:
+                        self.cancel(client.jobs[client_id])
+                    else:
+                        client.send({'type': 'error', 'id': client_id, 'error': "no such run"})
+                else:
+                    client.send({'type': 'error', 'id': client_id, 'error': "unknown request type "+str(kind)})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Cancelled when the service closes
+            pass
+        finally:
+            client.closed = True
+            for job in list(client.jobs.values()):
+                self.cancel(job)
+            writer.close()
+            del self.clients[client]
+
+    async def close(self):
+        """
+        Stops listening, stops the workers and ends their processes.
+        """
+        if self.server != None:
+            self.server.close()
+        for client, task in list(self.clients.items()):
+            client.writer.close()
+            task.cancel()
+        await asyncio.gather(*self.clients.values(), return_exceptions=True)
+        self.dispatcher.cancel()
+        for worker in self.workers:
+            self.loop.remove_reader(worker['connection'].fileno())
+            try:
+                worker['connection'].send(('end', None))
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker['process'].join(timeout=5)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+            worker['connection'].close()
+        self.workers = []
+
+async def serve(path=None, host='127.0.0.1', port=None, **options):
+    """
+    Runs a SimulationService until cancelled.
+    :param options: SimulationService arguments
+    """
+    service = SimulationService(**options)
+    server = await service.start(path, host, port)
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(args=None):
+    """
+    Command line entry point for running the simulation service.
+    :param args: Argument list, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Serves ACO simulation runs over a local socket.')
+    parser.add_argument('--socket', default=None, help='Unix socket path')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host, if no --socket')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port, if no --socket')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--max-pending', type=int, default=64, help='Runs queued before clients are held back')
+    parser.add_argument('--cache', default=None, help='Result cache directory')
+    args = parser.parse_args(args)
+
+    try:
+        asyncio.run(serve(args.socket, args.host, args.port, workers=args.workers, max_pending=args.max_pending,
+                          cache_directory=args.cache))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import os
+import json
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from aco import aco
+from ensemble import Ensemble, incompatibility
+from cache import ResultCache, run_key
+
+def grid_configs(grid):
+    """
+    Expands a parameter grid into every combination of its values.
+    :param grid:   Dictionary of parameter name to list of values
+    :return [dict]: Parameter configurations
+    """
+    names = sorted(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+def random_configs(space, samples, seed=0):
+    """
+    Draws random parameter configurations. A list of values is sampled
+    uniformly, and a {'low': a, 'high': b} range is sampled as an int if both
+    ends are ints, otherwise as a float.
+    :param space:   Dictionary of parameter name to list or range
+    :param samples: Number of configurations
+    :param seed:    Seed for the draws
+    :return [dict]: Parameter configurations
+    """
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(samples):
+        config = {}
+        for name in sorted(space.keys()):
+            values = space[name]
+            if isinstance(values, dict):
+                low, high = values['low'], values['high']
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = int(rng.integers(low, high, endpoint=True))
+                else:
+                    config[name] = float(rng.uniform(low, high))
+            else:
+                config[name] = values[int(rng.integers(len(values)))]
+        configs.append(config)
+    return configs
+
+def run_seed(seed, config_index, replicate):
+    """
+    Derives an independent seed for a single run, so every run gets the
+    same seed however the sweep is split or resumed.
+    :param seed:         Sweep seed
+    :param config_index: Index of the parameter configuration
+    :param replicate:    Replicate number
+    :return int:         Run seed
+    """
+    sequence = np.random.SeedSequence(seed, spawn_key=(config_index, replicate))
+    return int(sequence.generate_state(1)[0])
+
+def task_record(task, result, cached=False):
+    record = dict(task)
+    record['result'] = result.to_dict()
+    record['cached'] = cached
+    return record
+
+def run_one(task, cache=None):
+    """
+    Runs a single simulation. Called in worker processes.
+    :param task:  Dictionary with run_id, params, seed and max_steps
+    :param cache: ResultCache to read and store results, or None
+    :return dict: Task values with the run result added
+    """
+    return run_batch([task], cache)[0]
+
+def run_batch(tasks, cache=None):
+    """
+    Runs several simulations with the same parameters. Called in worker
+    processes. Vectorized runs are stepped together as an Ensemble,
+    which gives the same results as running them one at a time.
+    :param tasks:   Task dictionaries, as for run_one
+    :param cache:   ResultCache to read and store results, or None
+    :return [dict]: Task values with the run results added
+    """
+    records = [None]*len(tasks)
+    keys = [None]*len(tasks)
+    if cache != None:
+        for i, task in enumerate(tasks):
+            keys[i] = run_key(dict(task['params'], seed=task['seed']), task['max_steps'])
+            result = cache.get(keys[i]) if keys[i] != None else None
+            if result != None:
+                records[i] = task_record(task, result, cached=True)
+
+    pending = [i for i in range(len(tasks)) if records[i] == None]
+    simulations = [aco(seed=tasks[i]['seed'], **tasks[i]['params']) for i in pending]
+    if len(simulations) == 0:
+        return records
+    if incompatibility(simulations) != None:
+        results = [simulation.run(max_steps=tasks[i]['max_steps']) for i, simulation in zip(pending, simulations)]
+    else:
+        results = Ensemble(simulations).run(max_steps=tasks[0]['max_steps'])
+
+    for i, simulation, result in zip(pending, simulations, results):
+        if keys[i] != None:
+            cache.put(keys[i], result, simulation)
+        records[i] = task_record(tasks[i], result)
+    return records
+
+class Sweep:
+    def __init__(self, configs, base_params=None, replicates=1, seed=0, max_steps=None):
+        """
+        Parameter sweep over a list of configurations.
+        :param configs:     List of parameter dictionaries to sweep
+        :param base_params: Parameters shared by every run
+        :param replicates:  Runs per configuration
+        :param seed:        Sweep seed, every run seed is derived from it
+        :param max_steps:   Step budget for each run
+        """
+        self.configs = configs
+        self.base_params = base_params if base_params != None else {}
+        self.replicates = replicates
+        self.seed = seed
+        self.max_steps = max_steps
+
+    def tasks(self):
+        """
+        Lists every run in the sweep.
+        :return [dict]: Run tasks
+        """
+        tasks = []
+        for config_index, config in enumerate(self.configs):
+            params = dict(self.base_params)
+            params.update(config)
+            for replicate in range(self.replicates):
+                tasks.append({
+                    'run_id': str(config_index)+"-"+str(replicate),
+                    'config_index': config_index,
+                    'replicate': replicate,
+                    'seed': run_seed(self.seed, config_index, replicate),
+                    'params': params,
+                    'max_steps': self.max_steps
+                })
+        return tasks
+
+    def run(self, output, workers=None, resume=True, batch=1, cache=None):
+        """
+        Runs the sweep over a process pool, appending each result to the
+        output file as a JSON line as soon as its run completes.
+        :param output:  Path of the JSON lines results file
+        :param workers: Number of worker processes, defaults to CPU count
+        :param resume:  Skips runs already in the output file, which
+                        must come from the same specification
+        :param batch:   Replicates of a configuration run together in
+                        one ensemble
+        :param cache:   ResultCache shared by the workers, or None
+        :return int:    Number of runs completed by this call
+        """
+        done = completed_runs(output) if resume else {}
+        tasks = self.tasks()
+        for task in tasks:
+            # Results left by a different specification would be mixed in
+            if task['run_id'] in done and done[task['run_id']] != run_signature(task):
+                raise ValueError(output+" holds results of a different sweep specification (run "+task['run_id']
+                                 +"), restart the sweep or use another output file")
+        pending = [task for task in tasks if task['run_id'] not in done]
+        if workers == None:
+            workers = os.cpu_count() or 1
+
+        # Batches only hold runs of the same configuration
+        batches = []
+        for _, config_tasks in itertools.groupby(pending, key=lambda task: task['config_index']):
+            config_tasks = list(config_tasks)
+            for start in range(0, len(config_tasks), batch):
+                batches.append(config_tasks[start:start+batch])
+
+        completed = 0
+        mode = 'a' if resume else 'w'
+        with open(output, mode) as results_file, ProcessPoolExecutor(max_workers=workers) as executor:
+            # Start on a fresh line if the last run was cut off mid-write
+            if results_file.tell() > 0 and not ends_with_newline(output):
+                results_file.write("\n")
+
+            # Only keep a few tasks per worker in flight, so large sweeps
+            # don't queue every task up front
+            tasks = iter(batches)
+            running = set()
+            while True:
+                for tasks_batch in itertools.islice(tasks, workers*2 - len(running)):
+                    running.add(executor.submit(run_batch, tasks_batch, cache))
+                if len(running) == 0:
+                    break
+
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for record in future.result():
+                        results_file.write(json.dumps(record)+"\n")
+                        completed += 1
+                    results_file.flush()
+
+        return completed
+
+def run_signature(task):
+    """
+    Describes what a run computes, to tell whether a stored result
+    belongs to the same sweep.
+    :param task: Run task or result record
+    :return str: Seed, parameters and step budget as sorted JSON
+    """
+    return json.dumps({'seed': task['seed'], 'params': task['params'], 'max_steps': task['max_steps']}, sort_keys=True)
+
+def completed_runs(output):
+    """
+    Finds the runs already written to a results file. A partially
+    written last line, left by an interrupted sweep, is ignored.
+    :param output: Path of the JSON lines results file
+    :return dict:  Run id to run_signature of each completed run
+    """
+    done = {}
+    if not os.path.exists(output):
+        return done
+
+    with open(output) as results_file:
+        for line in results_file:
+            try:
+                record = json.loads(line)
+                done[record['run_id']] = run_signature(record)
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+def ends_with_newline(path):
+    """
+    Checks if a non-empty file ends with a newline.
+    :param path: Path of the file
+    :return bool: If the last byte is a newline
+    """
+    with open(path, 'rb') as check_file:
+        check_file.seek(-1, os.SEEK_END)
+        return check_file.read(1) == b"\n"
+
+def load_sweep(spec):
+    """
+    Creates a sweep from a specification dictionary, with either a 'grid'
+    or a 'random' parameter space and optional 'samples', 'base',
+    'replicates', 'seed' and 'max_steps' keys.
+    :param spec:  Sweep specification
+    :return Sweep: Sweep object
+    """
+    seed = spec.get('seed', 0)
+    if 'grid' in spec:
+        configs = grid_configs(spec['grid'])
+    elif 'random' in spec:
+        configs = random_configs(spec['random'], spec.get('samples', 10), seed)
+    else:
+        raise ValueError("sweep specification needs a 'grid' or 'random' parameter space")
+
+    return Sweep(configs,
+                 base_params=spec.get('base'),
+                 replicates=spec.get('replicates', 1),
+                 seed=seed,
+                 max_steps=spec.get('max_steps'))
+
+def main(args=None):
+    """
+    Command line entry point for running a sweep from a JSON specification.
+    :param args: Argument list, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Parameter sweep over ACO simulations.')
+    parser.add_argument('spec', help='JSON sweep specification')
+    parser.add_argument('--output', default='sweep_results.jsonl', help='JSON lines results file')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--restart', action='store_true', help='Overwrite results instead of resuming')
+    parser.add_argument('--batch', type=int, default=1, help='Replicates of a configuration run together as an ensemble')
+    parser.add_argument('--cache', default=None, help='Result cache directory, reused across sweeps')
+    parser.add_argument('--cache-size', type=float, default=1024, help='Result cache size limit in MB')
+    args = parser.parse_args(args)
+
+    with open(args.spec) as spec_file:
+        sweep = load_sweep(json.load(spec_file))
+
+    result_cache = ResultCache(args.cache, max_bytes=int(args.cache_size*2**20)) if args.cache != None else None
+    try:
+        completed = sweep.run(args.output, workers=args.workers, resume=not args.restart, batch=args.batch, cache=result_cache)
+    except ValueError as error:
+        parser.error(str(error))
+    print("Completed "+str(completed)+" runs.")
+    if result_cache != None:
+        stats = result_cache.stats()
+        print("Cache totals: "+str(stats['hits'])+" hits, "+str(stats['misses'])+" misses, hit rate "+format(stats['hit_rate'], '.1%')
+              +", "+format(stats['seconds_saved'], '.1f')+"s and "+str(stats['bytes_saved'])+" bytes saved.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import sys
+import time
+import select
+import numpy as np
+
+try:
+    import termios
+    import tty
+except ImportError:
+    termios = None
+
+# Cell codes, in drawing priority: when a zoomed out cell covers several
+# grid cells, the highest code is shown
+empty, wall, ant, food, home = range(5)
+
+def cell_codes(simulation):
+    """
+    Finds what to draw in every cell, with the same precedence as
+    aco.print_grid: home, then food, then ants.
+    :param simulation: aco object
+    :return np.array:  uint8 array of cell codes
+    """
+    codes = np.full(simulation.dimensions, empty, dtype=np.uint8)
+    if simulation.terrain != None:
+        codes[simulation.terrain.blocked] = wall
+    codes[simulation.ant_grid > 0] = ant
+    codes[simulation.food_grid > 0] = food
+    codes[simulation.home_grid] = home
+    return codes
+
+class TerminalRenderer:
+    def __init__(self, stream=None, fps=10, viewport=None, origin=(0, 0), zoom=1, keys=False, chars='.#AFH'):
+        """
+        Draws the simulation in a terminal, only rewriting the cells
+        that changed since the last frame using ANSI cursor movement.
+        Frames are skipped to stay under the target frame rate, however
+        fast the simulation runs. Large grids can be shown through a
+        viewport, zoomed out so each character covers several cells.
+        :param stream:   Text stream to write to, defaults to sys.stdout
+        :param fps:      Maximum frames per second, or None for no limit
+        :param viewport: (rows, columns) of characters shown, or None to
+                         fit the whole grid
+        :param origin:   Grid cell at the top left of the viewport
+        :param zoom:     Grid cells per character along each axis
+        :param keys:     Reads w/a/s/d to pan and +/- to zoom from stdin
+        :param chars:    Characters for empty, wall, ant, food and home
+        """
+        self.stream = stream if stream != None else sys.stdout
+        self.fps = fps
+        self.viewport = viewport
+        self.origin = list(origin)
+        self.zoom = zoom
+        self.chars = np.array(list(chars))
+        self.previous = None
+        self.last_frame = None
+        self.saved_terminal = None
+        if keys and termios != None and sys.stdin.isatty():
+            self.saved_terminal = termios.tcgetattr(sys.stdin)
+            tty.setcbreak(sys.stdin)
+
+    def view(self, codes):
+        """
+        Cuts the viewport out of the grid, zooming out by keeping the
+        highest priority code in each block of cells.
+        :param codes:     Full grid of cell codes
+        :return np.array: Cell codes for each character on screen
+        """
+        zoom = self.zoom
+        if self.viewport != None:
+            rows, columns = self.viewport
+        else:
+            rows, columns = -(-codes.shape[0] // zoom), -(-codes.shape[1] // zoom)
+        rows, columns = min(rows, -(-codes.shape[0] // zoom)), min(columns, -(-codes.shape[1] // zoom))
+
+        # Keep the viewport inside the grid
+        self.origin[0] = min(max(self.origin[0], 0), max(codes.shape[0] - rows*zoom, 0))
+        self.origin[1] = min(max(self.origin[1], 0), max(codes.shape[1] - columns*zoom, 0))
+        x, y = self.origin
+
+        block = np.full((rows*zoom, columns*zoom), empty, dtype=np.uint8)
+        visible = codes[x:x+rows*zoom, y:y+columns*zoom]
+        block[:visible.shape[0], :visible.shape[1]] = visible
+        return block.reshape(rows, zoom, columns, zoom).max(axis=(1, 3))
+
+    def draw(self, simulation, force=False):
+        """
+        Draws a frame, unless the last frame was too recent.
+        :param simulation: aco object to draw
+        :param force:      Draws even if over the frame rate
+        :return bool:      If a frame was drawn
+        """
+        now = time.perf_counter()
+        if not force and self.fps != None and self.last_frame != None and now - self.last_frame < 1/self.fps:
+            return False
+        self.last_frame = now
+
+        screen = self.view(cell_codes(simulation))
+        output = []
+        if self.previous is None or self.previous.shape != screen.shape:
+            # Full redraw: clear, hide the cursor and draw the border
+            border = " "+("-"*(screen.shape[1]*2+1))
+            output.append("\x1b[2J\x1b[?25l\x1b[1;1H"+border+"\n")
+            for row in self.chars[screen]:
+                output.append("| "+" ".join(row)+" |\n")
+            output.append(border+"\n")
+        else:
+            for row in np.flatnonzero((screen != self.previous).any(axis=1)).tolist():
+                changed = np.flatnonzero(screen[row] != self.previous[row])
+                # Runs of neighbouring changed cells are written together
+                for run in np.split(changed, np.flatnonzero(np.diff(changed) > 1)+1):
+                    output.append("\x1b[%d;%dH" % (row+2, run[0]*2+3) + " ".join(self.chars[screen[row, run[0]:run[-1]+1]]))
+        self.previous = screen
+
+        status = "Step "+str(simulation.steps)+"  food left "+str(simulation.food_left())+"  brought home "+str(simulation.brought_food)
+        if self.zoom > 1 or screen.shape != tuple(simulation.dimensions):
+            status += "  view "+str(self.origin[0])+","+str(self.origin[1])+" zoom "+str(self.zoom)
+        output.append("\x1b[%d;1H\x1b[2K" % (screen.shape[0]+3) + status)
+        self.stream.write("".join(output))
+        self.stream.flush()
+        return True
+
+    def pan(self, rows, columns):
+        """
+        Moves the viewport by a number of characters.
+        :param rows:    Characters to move down
+        :param columns: Characters to move right
+        """
+        self.origin[0] += rows*self.zoom
+        self.origin[1] += columns*self.zoom
+        self.last_frame = None
+
+    def set_zoom(self, zoom):
+        """
+        Changes the grid cells per character, keeping the viewport
+        size. The next frame is a full redraw.
+        :param zoom: Grid cells per character along each axis
+        """
+        self.zoom = max(int(zoom), 1)
+        self.previous = None
+        self.last_frame = None
+
+    def handle_keys(self):
+        """
+        Applies any pan and zoom keys waiting on stdin.
+        """
+        if self.saved_terminal == None:
+            return
+        while select.select([sys.stdin], [], [], 0)[0]:
+            key = sys.stdin.read(1)
+            if key == '':
+                break
+            elif key == 'w': self.pan(-1, 0)
+            elif key == 's': self.pan(1, 0)
+            elif key == 'a': self.pan(0, -1)
+            elif key == 'd': self.pan(0, 1)
+            elif key in '+=': self.set_zoom(self.zoom-1)
+            elif key in '-_': self.set_zoom(self.zoom+1)
+
+    def close(self):
+        """
+        Restores the terminal, leaving the cursor below the last frame.
+        """
+        if self.saved_terminal != None:
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, self.saved_terminal)
+            self.saved_terminal = None
+        rows = self.previous.shape[0] if self.previous is not None else 0
+        self.stream.write("\x1b[%d;1H\x1b[?25h\n" % (rows+4))
+        self.stream.flush()
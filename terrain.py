@@ -0,0 +1,159 @@
+import os
+import numpy as np
+import kernel
+import distance
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+class Terrain:
+    def __init__(self, blocked, cost=None):
+        """
+        Walls and movement costs for a grid. Each cell stores a bitmask
+        of the neighbours an ant can move to from it, one bit per entry
+        in kernel.offsets, so blocked directions are masked in one
+        operation. Distance fields are cached per set of nests.
+        :param blocked: Boolean array of cells ants cannot enter
+        :param cost:    Array of movement costs, at least 1, or None for
+                        every cell costing 1. Movement weights into a
+                        cell are divided by its cost.
+        """
+        self.blocked = np.array(blocked, dtype=bool)
+        self.dimensions = self.blocked.shape
+        self.cost = np.ones(self.dimensions) if cost is None else np.array(cost, dtype=float)
+        if self.cost.shape != self.dimensions:
+            raise ValueError("terrain cost and blocked arrays must have the same shape")
+        if (self.cost[~self.blocked] < 1).any():
+            raise ValueError("terrain costs must be at least 1")
+
+        # Cells outside the grid are blocked, and cost 1 so that weights
+        # into them stay 0
+        padded_blocked, inside = kernel.padded(self.dimensions, bool, fill=True)
+        inside[:] = self.blocked
+        self.passability = np.zeros(self.dimensions, dtype=np.uint8)
+        for bit, (dx, dy) in enumerate(kernel.offsets.tolist()):
+            open_cells = ~padded_blocked[1+dx:self.dimensions[0]+1+dx, 1+dy:self.dimensions[1]+1+dy]
+            self.passability |= open_cells.astype(np.uint8) << bit
+        self.padded_cost, inside = kernel.padded(self.dimensions, float, fill=1.0)
+        inside[:] = self.cost
+
+        self.distances = {}
+
+    def passable(self):
+        """
+        :return np.array: Boolean array of cells ants can enter
+        """
+        return ~self.blocked
+
+    def mask(self, xs, ys):
+        """
+        Finds which neighbours ants can move to.
+        :param xs:        (n,) ant x coordinates
+        :param ys:        (n,) ant y coordinates
+        :return np.array: (n, 8) if each movement is allowed
+        """
+        return allowed_moves(self.passability, xs, ys)
+
+    def distance(self, nests, metric='bfs'):
+        """
+        Distance from every cell to the nearest nest, built once per set
+        of nests and metric. Only 'bfs' goes around blocked cells.
+        :param nests:     List of nest coordinates
+        :param metric:    Distance metric, see distance.metrics
+        :return np.array: int32 grid of distances
+        """
+        key = (tuple(tuple(nest) for nest in nests), metric)
+        if key not in self.distances:
+            self.distances[key] = distance.distance_field(self.dimensions, nests, metric, self.passable())
+        return self.distances[key]
+
+    @classmethod
+    def from_image(cls, path, threshold=128, max_cost=1.0):
+        """
+        Loads terrain from an image, with one pixel per cell and rows
+        along the first grid dimension. Pixels darker than the threshold
+        are blocked. Other pixels cost from 1 for white up to max_cost
+        just above the threshold. PGM and PPM files are read directly,
+        other formats need Pillow.
+        :param path:      Image file path
+        :param threshold: Grey level below which cells are blocked
+        :param max_cost:  Cost of the darkest passable cells
+        :return Terrain:  Loaded terrain
+        """
+        with open(path, 'rb') as image_file:
+            magic = image_file.read(2)
+        if magic in [b'P2', b'P3', b'P5', b'P6']:
+            grey = read_netpbm(path)
+        elif Image != None:
+            grey = np.asarray(Image.open(path).convert('L'), dtype=float)
+        else:
+            raise ValueError("reading "+os.path.basename(path)+" needs Pillow, or use a PGM or PPM file")
+
+        blocked = grey < threshold
+        cost = 1 + (max_cost-1)*(255-grey)/max(255-threshold, 1)
+        return cls(blocked, np.where(blocked, 1.0, cost))
+
+def allowed_moves(passability, xs, ys):
+    """
+    Unpacks passability bitmasks.
+    :param passability: Grid of passability bitmasks
+    :param xs:          (n,) ant x coordinates
+    :param ys:          (n,) ant y coordinates
+    :return np.array:   (n, 8) if each movement is allowed
+    """
+    return (passability[xs, ys][:, None] >> np.arange(8, dtype=np.uint8)) & 1 == 1
+
+# Terrain loaded from files, keyed by path and modification time, so
+# runs in the same process share one terrain and its distance fields
+loaded = {}
+
+def load_terrain(terrain):
+    """
+    Converts a terrain argument into a Terrain.
+    :param terrain:  Terrain, boolean array of blocked cells or image path
+    :return Terrain: Terrain object
+    """
+    if isinstance(terrain, Terrain):
+        return terrain
+    if isinstance(terrain, str):
+        key = (os.path.abspath(terrain), os.path.getmtime(terrain))
+        if key not in loaded:
+            loaded[key] = Terrain.from_image(terrain)
+        return loaded[key]
+    return Terrain(terrain)
+
+def read_netpbm(path):
+    """
+    Reads a PGM or PPM image, in plain or raw format, as grey levels.
+    :param path:      Image file path
+    :return np.array: (rows, columns) grey levels from 0 to 255
+    """
+    with open(path, 'rb') as image_file:
+        data = image_file.read()
+
+    # Header: magic, width, height and maximum value, separated by
+    # whitespace, with comments from # to the end of a line
+    tokens, position = [], 0
+    while len(tokens) < 4:
+        while data[position:position+1].isspace():
+            position += 1
+        if data[position:position+1] == b'#':
+            position = data.index(b'\n', position)
+            continue
+        start = position
+        while not data[position:position+1].isspace():
+            position += 1
+        tokens.append(data[start:position])
+    magic, width, height, max_value = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    channels = 3 if magic in [b'P3', b'P6'] else 1
+
+    if magic in [b'P5', b'P6']:
+        dtype = np.uint8 if max_value < 256 else np.dtype('>u2')
+        pixels = np.frombuffer(data, dtype=dtype, count=width*height*channels, offset=position+1)
+    else:
+        pixels = np.array(data[position:].split()[:width*height*channels], dtype=int)
+
+    pixels = pixels.reshape(height, width, channels).astype(float)*255/max_value
+    return pixels.mean(axis=2)
@@ -0,0 +1,22 @@
+import os
+import sys
+import numpy as np
+
+# The simulator modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def assert_same_state(a, b, exact=True):
+    """
+    Asserts two simulations are in the same state. Pheromones are only
+    compared to rounding if exact is False.
+    """
+    assert a.steps == b.steps
+    assert a.brought_food == b.brought_food
+    assert np.array_equal(a.ants.locations, b.ants.locations)
+    assert np.array_equal(a.ants.carry, b.ants.carry)
+    assert np.array_equal(a.ants.taboo, b.ants.taboo)
+    assert np.array_equal(a.food.values, b.food.values)
+    if exact:
+        assert np.array_equal(a.pheromones, b.pheromones)
+    else:
+        assert np.allclose(a.pheromones, b.pheromones)
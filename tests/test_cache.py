@@ -0,0 +1,67 @@
+import os
+import time
+import pytest
+from aco import aco
+from cache import ResultCache, run_key, simulation_key
+from conftest import assert_same_state
+
+params = {'dimensions': (15, 15), 'no_ants': 10, 'no_food': 4, 'engine': 'vectorized', 'seed': 2}
+
+def test_equivalent_params_share_a_key():
+    key = run_key(params, max_steps=50)
+    assert key == simulation_key(aco(**params), max_steps=50)
+    assert key == run_key(dict(params, home_coors=[7, 7]), max_steps=50)
+    assert key == run_key(dict(params, nests=[(7, 7)], pheromone_update='tick', debug=True), max_steps=50)
+    assert key == simulation_key(aco(**dict(params, dimensions=[15, 15])), max_steps=50)
+
+def test_different_runs_get_different_keys():
+    key = run_key(params, max_steps=50)
+    assert key != run_key(dict(params, seed=3), max_steps=50)
+    assert key != run_key(dict(params, evaporation_coefficient=0.1), max_steps=50)
+    assert key != run_key(params, max_steps=51)
+    assert key != run_key(params, max_steps=50, until_finished=False)
+    assert run_key(dict(params, seed=None)) == None
+
+@pytest.mark.parametrize('store_state', [False, True])
+def test_cached_runs_match_fresh_runs(tmp_path, store_state):
+    cache = ResultCache(str(tmp_path), store_state=store_state)
+    first = cache.run(aco(**params), max_steps=200)
+    simulation = aco(**params)
+    second = cache.run(simulation, max_steps=200)
+    assert second.to_dict() == first.to_dict()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+    expected = aco(**params)
+    expected.run(max_steps=200)
+    if store_state:
+        assert_same_state(simulation, expected)
+    else:
+        assert simulation.steps == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    keys = []
+    for seed in range(4):
+        keys.append(run_key(dict(params, seed=seed), max_steps=20))
+        cache.run(aco(**dict(params, seed=seed)), max_steps=20)
+
+    # Entries were used from last to first, then the first is read
+    now = time.time()
+    for age, key in enumerate(reversed(keys)):
+        os.utime(cache.path(key, '.json'), (now - 100 + age, now - 100 + age))
+    assert cache.get(keys[0]) != None
+
+    cache.max_bytes = cache.entry_size(keys[0]) + cache.entry_size(keys[1])
+    assert cache.evict() == 2
+    assert [cache.get(key) != None for key in keys] == [True, True, False, False]
+    assert cache.stats()['evictions'] == 2
+
+def test_put_evicts_once_over_the_limit(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.run(aco(**params), max_steps=20)
+    cache.max_bytes = cache.size()*2 + 10
+    for seed in range(1, 5):
+        cache.run(aco(**dict(params, seed=seed)), max_steps=20)
+        assert cache.size() <= cache.max_bytes
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,30 @@
+import pytest
+from aco import aco
+from conftest import assert_same_state
+
+@pytest.mark.parametrize('engine, backend', [('reference', 'dense'), ('vectorized', 'dense'), ('vectorized', 'sparse')])
+def test_checkpoint_continues_identically(tmp_path, engine, backend):
+    simulation = aco((25, 20), 30, 6, engine=engine, pheromone_backend=backend, seed=7)
+    simulation.run(max_steps=80)
+    path = str(tmp_path / 'run.ckpt')
+    simulation.save(path)
+    restored = aco.load(path)
+    for _ in range(120):
+        simulation.increment()
+        restored.increment()
+    assert_same_state(simulation, restored)
+
+def test_checkpoint_every_needs_a_path():
+    simulation = aco((10, 10), 5, 2, seed=0)
+    with pytest.raises(ValueError):
+        simulation.run(max_steps=10, checkpoint_every=5)
+
+def test_periodic_checkpoints_resume_from_the_last_save(tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    simulation = aco((25, 20), 30, 6, engine='vectorized', seed=2)
+    simulation.run(max_steps=50, until_finished=False, checkpoint_path=path, checkpoint_every=20)
+    restored = aco.load(path)
+    assert restored.steps == 40
+    replayed = aco((25, 20), 30, 6, engine='vectorized', seed=2)
+    replayed.run(max_steps=40, until_finished=False)
+    assert_same_state(restored, replayed)
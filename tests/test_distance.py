@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import distance
+
+def test_open_grid_bfs_is_chebyshev():
+    nests = [[3, 4], [15, 9]]
+    bfs = distance.distance_field((20, 12), nests, 'bfs')
+    assert np.array_equal(bfs, distance.distance_field((20, 12), nests, 'chebyshev'))
+    assert bfs[3, 4] == bfs[15, 9] == 0
+
+def test_bfs_goes_around_walls():
+    passable = np.ones((9, 9), dtype=bool)
+    passable[4, :8] = False
+    bfs = distance.distance_field((9, 9), [[0, 0]], 'bfs', passable)
+    # 8 moves to the gap in the last column, then along the other side
+    assert bfs[4, 8] == 8
+    assert bfs[8, 8] == 8 + 4
+    assert bfs[5, 0] == 8 + 8
+    assert bfs[4, 0] == distance.unreachable
+
+def test_bfs_marks_enclosed_cells_unreachable():
+    passable = np.ones((10, 10), dtype=bool)
+    passable[5:8, 5] = passable[5:8, 7] = passable[5, 5:8] = passable[7, 5:8] = False
+    bfs = distance.distance_field((10, 10), [[0, 0]], 'bfs', passable)
+    assert bfs[6, 6] == distance.unreachable
+    passable[6, 6] = False
+    assert (bfs[passable] != distance.unreachable).all()
+
+def test_manhattan_uses_the_nearest_nest():
+    field = distance.distance_field((10, 10), [[0, 0], [9, 9]])
+    assert field[1, 2] == 3 and field[8, 6] == 4
+    with pytest.raises(ValueError):
+        distance.distance_field((10, 10), [[0, 0]], 'euclidean')
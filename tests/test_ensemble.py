@@ -0,0 +1,35 @@
+import pytest
+from aco import aco
+from ensemble import Ensemble
+from conftest import assert_same_state
+
+# Options that are stacked per colony in an ensemble
+colony_options = [
+    dict(seed=0),
+    dict(seed=1, evaporation_coefficient=0.1),
+    dict(seed=2, pheromone_deposit=50.0),
+    dict(seed=3, carry_capacity=3),
+    dict(seed=4, nests=[[3, 3], [16, 12]]),
+    dict(seed=5, nests=[[2, 17], [10, 10], [17, 2]], evaporation_coefficient=0.005, carry_capacity=2)
+]
+
+def test_ensemble_matches_solo_runs():
+    colonies = [aco((20, 20), 15, 5, engine='vectorized', **options) for options in colony_options]
+    results = Ensemble(colonies).run(max_steps=300)
+    for options, colony, result in zip(colony_options, colonies, results):
+        solo = aco((20, 20), 15, 5, engine='vectorized', **options)
+        solo_result = solo.run(max_steps=300)
+        assert (result.steps, result.brought_food, result.finished) == (solo_result.steps, solo_result.brought_food, solo_result.finished)
+        assert_same_state(colony, solo)
+
+def test_ensemble_of_colonies_without_ants():
+    colonies = [aco((10, 10), 0, 3, engine='vectorized', seed=seed) for seed in range(2)]
+    results = Ensemble(colonies).run(max_steps=20)
+    assert [result.steps for result in results] == [20, 20]
+    assert not any(result.finished for result in results)
+
+def test_ensemble_rejects_mismatched_colonies():
+    with pytest.raises(ValueError):
+        Ensemble([aco((20, 20), 15, 5, engine='vectorized', seed=0), aco((20, 20), 10, 5, engine='vectorized', seed=1)])
+    with pytest.raises(ValueError):
+        Ensemble([aco((20, 20), 15, 5, engine='reference', seed=0)])
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from aco import aco
+from food import FoodStore
+
+def test_store_totals_follow_takes():
+    store = FoodStore((10, 10), [[1, 1], [5, 5], [8, 2]], food_capacity=2)
+    assert (len(store), store.total) == (3, 6)
+    assert not store.take(1)
+    assert store.take(1)
+    assert store.at(5, 5) == -1 and store.grid[5, 5] == 0
+    assert (len(store), store.total) == (2, 4)
+    assert store.nearest(6, 6) == 2
+    store.update(np.array([0, 0, 1]))
+    assert (len(store), store.total) == (1, 1)
+    assert store.nearest(0, 0) == 2
+
+@pytest.mark.parametrize('engine, deplete', [('reference', True), ('vectorized', True), ('vectorized', False)])
+def test_carried_food_is_kept_up_to_date(engine, deplete):
+    simulation = aco((20, 20), 30, 5, engine=engine, carry_capacity=2, food_deplete=deplete, seed=3)
+    for _ in range(300):
+        simulation.increment()
+        assert simulation.carried_food == int(simulation.ants.carry.sum())
+        assert simulation.is_finished() == ((simulation.all_food == simulation.brought_food)
+                                            or (simulation.ants.carry.sum() == 0 and len(simulation.food) == 0))
@@ -0,0 +1,79 @@
+import random
+import hashlib
+import numpy as np
+import pytest
+import aco as aco_module
+import kernel
+from aco import aco
+
+class PythonRandom:
+    """
+    Draws from the random module, as the original single file simulator
+    did, so seeded runs can be compared with it.
+    """
+    def random(self, size=None):
+        return random.random()
+
+    def integers(self, n, *args, **kwargs):
+        return random.randint(0, n-1)
+
+# Runs of the original simulator on a 15x12 grid with 20 ants and 6 food,
+# seeded with random.seed(seed): (seed, steps, brought_food, state hash)
+baseline_runs = [
+    (0, 150, 53, '74619346729b13609222cdd58bd5bf7c31fbc39d64f70ee58c30b45d0982ac62'),
+    (1, 150, 57, '65e066e8fdd233eeb65fc93ce0d677f70a628a1da5a2ca78470b32af87fd5977'),
+    (2, 150, 50, '4ed2937288571f9bf6e2ac7a7db3cb57571cd4bbcb5c03240e992fb1646c8d76')
+]
+
+@pytest.mark.parametrize('seed, steps, brought_food, state_hash', baseline_runs)
+def test_ant_updates_match_original(monkeypatch, seed, steps, brought_food, state_hash):
+    random.seed(seed)
+    monkeypatch.setattr(aco_module.np.random, 'default_rng', lambda seed=None: PythonRandom())
+    simulation = aco((15, 12), 20, 6, pheromone_update='ant', food_placement='sequential', seed=seed)
+    monkeypatch.undo()
+
+    state = hashlib.sha256()
+    for _ in range(150):
+        if simulation.is_finished():
+            break
+        food_left = simulation.increment()
+        state.update(np.array([food_left, simulation.brought_food], dtype=np.int64).tobytes())
+        state.update(np.asarray(simulation.pheromones, dtype=np.float64).tobytes())
+        ants = np.concatenate([simulation.ants.locations, simulation.ants.carry[:, None]], axis=1)
+        state.update(ants.astype(np.int64).tobytes())
+
+    assert simulation.steps == steps
+    assert simulation.brought_food == brought_food
+    assert state.hexdigest() == state_hash
+
+@pytest.mark.parametrize('seed', range(3))
+def test_movement_weights_match_probs(seed):
+    simulation = aco((14, 11), 30, 8, carry_capacity=2, food_capacity=4, nests=[[2, 3], [10, 8]], seed=seed)
+    for _ in range(150):
+        weights, _, _ = simulation.get_movement_weights()
+        probs = np.array([simulation.get_movement_probs(ant) for ant in simulation.ants], dtype=float)
+        assert np.array_equal(weights, probs)
+        simulation.increment()
+
+class FixedDraws:
+    def __init__(self, draws):
+        self.draws = np.array(draws)
+
+    def random(self, size=None):
+        return self.draws
+
+def test_sample_moves_follows_cumulative_weights():
+    weights = np.array([[1.0, 0, 0, 3.0, 0, 0, 0, 0],
+                        [0, 0, 0, 0, 0, 0, 0, 2.0],
+                        [1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+                        [0, 0, 0, 0, 0, 0, 0, 0]])
+    choices, valid = kernel.sample_moves(weights, FixedDraws([0.3, 0.5, 0.99, 0.5]))
+    assert list(choices[:3]) == [3, 7, 7]
+    assert list(valid) == [True, True, True, False]
+
+def test_resolve_conflicts_keeps_the_lowest_index():
+    targets = np.array([5, 5, 9, 5, 9, 2])
+    moving = np.array([True, True, True, True, False, True])
+    shared = np.array([False, False, False, False, False, True])
+    moving = kernel.resolve_conflicts(targets, moving, shared)
+    assert list(moving) == [True, False, True, False, False, True]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from aco import aco
+from pheromones import PheromoneField, SparsePheromoneField
+from conftest import assert_same_state
+
+@pytest.mark.parametrize('engine', ['reference', 'vectorized'])
+def test_sparse_pheromones_match_dense(engine):
+    dense = aco((30, 30), 40, 6, engine=engine, seed=3)
+    sparse = aco((30, 30), 40, 6, engine=engine, pheromone_backend='sparse', seed=3)
+    for _ in range(300):
+        dense.increment()
+        sparse.increment()
+    assert_same_state(dense, sparse, exact=False)
+
+def test_sparse_field_drops_evaporated_cells():
+    dense = PheromoneField((12, 9), deposit=5.0)
+    sparse = SparsePheromoneField((12, 9), deposit=5.0, prune_interval=8)
+    xs, ys = np.array([0, 3, 3, 11]), np.array([0, 4, 4, 8])
+    dense.deposit(xs, ys)
+    sparse.deposit(xs, ys)
+    assert len(sparse.cells) == 3
+    for _ in range(400):
+        dense.evaporate()
+        sparse.evaporate()
+        assert np.allclose(dense.values, sparse.values)
+    assert len(sparse.cells) == 0
+
+def test_sparse_gather_reads_zero_outside_the_grid():
+    sparse = SparsePheromoneField((5, 5))
+    sparse.deposit(np.array([0]), np.array([0]))
+    values = sparse.gather(np.array([-1, 0, 0, 5]), np.array([0, -1, 0, 4]))
+    assert values[0] == 0.0 and values[1] == 0.0 and values[3] == 0.0
+    assert values[2] == sparse.floor + sparse.deposit_amount
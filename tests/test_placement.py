@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pytest
+from aco import aco
+from placement import place_food, ring
+
+def free_cells(dimensions, nests):
+    free = np.ones(dimensions, dtype=bool)
+    free[tuple(np.array(nests).T)] = False
+    return free
+
+@pytest.mark.parametrize('strategy', ['uniform', 'clustered', 'ring', 'sequential'])
+def test_food_cells_are_distinct_and_free(strategy):
+    dimensions, nests = (30, 20), [[15, 10], [3, 4]]
+    free = free_cells(dimensions, nests)
+    free[10:20, 5] = False
+    for seed in range(5):
+        coors = place_food(strategy, dimensions, 20, np.random.default_rng(seed), free, nests)
+        assert coors.shape == (20, 2) and coors.dtype == np.int32
+        assert len(np.unique(coors, axis=0)) == 20
+        assert free[coors[:, 0], coors[:, 1]].all()
+
+def test_ring_cells_are_at_the_radius():
+    nests = [[20, 20]]
+    coors = place_food('ring', (40, 40), 30, np.random.default_rng(0), free_cells((40, 40), nests), nests, radius=8, width=2)
+    distances = np.hypot(coors[:, 0]-20, coors[:, 1]-20)
+    assert (np.abs(distances-8) <= 1).all()
+    assert ring((40, 40), nests, 8, 2).sum() > 30
+
+def test_dense_placement_fills_every_free_cell():
+    for strategy in ['uniform', 'clustered', 'sequential']:
+        simulation = aco((12, 10), 1, 119, food_placement=strategy, seed=1)
+        assert len(simulation.food) == 119
+    with pytest.raises(ValueError):
+        aco((12, 10), 1, 120, seed=1)
+
+def test_food_from_file(tmp_path):
+    path = str(tmp_path / 'food.json')
+    with open(path, 'w') as food_file:
+        json.dump([[1, 2], [3, 4], [5, 6]], food_file)
+    simulation = aco((10, 10), 5, 2, food_placement='file', placement_options={'path': path}, seed=0)
+    assert simulation.food.locations.tolist() == [[1, 2], [3, 4]]
+
+    with open(path, 'w') as food_file:
+        json.dump([[1, 2], [1, 2]], food_file)
+    with pytest.raises(ValueError):
+        aco((10, 10), 5, 2, food_placement='file', placement_options={'path': path}, seed=0)
+    with pytest.raises(ValueError):
+        aco((10, 10), 5, 4, food_placement='file', placement_options={'path': path}, seed=0)
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        aco((10, 10), 5, 2, food_placement='spiral', seed=0)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from aco import aco
+from recorder import TrajectoryRecorder, TrajectoryReader
+
+def snapshot(simulation):
+    return (simulation.steps, simulation.ants.locations.copy(), simulation.ants.carry.copy(),
+            simulation.food.values.copy(), simulation.brought_food, np.array(simulation.pheromones, dtype=float))
+
+@pytest.mark.parametrize('pheromones', [True, False])
+def test_recorded_frames_read_back(tmp_path, pheromones):
+    simulation = aco((30, 25), 40, 6, engine='vectorized', food_capacity=3, seed=4)
+    simulation.run(max_steps=5)
+    recorder = TrajectoryRecorder(str(tmp_path / 'trajectory'), simulation, chunk_size=16, pheromones=pheromones)
+    states = [snapshot(simulation)]
+    for _ in range(70):
+        simulation.increment()
+        states.append(snapshot(simulation))
+    recorder.close()
+    assert simulation.recorder == None
+
+    reader = TrajectoryReader(str(tmp_path / 'trajectory'))
+    assert len(reader) == len(states)
+    # Read out of order, so chunks are loaded again after others
+    for index in [70, 0, 15, 16, 17, 3, 48, -1]:
+        frame = reader[index]
+        step, locations, carry, food_values, brought_food, field = states[index]
+        assert frame.step == step
+        assert np.array_equal(frame.ant_locations, locations)
+        assert np.array_equal(frame.carry, carry)
+        assert np.array_equal(frame.food_values, food_values)
+        assert frame.brought_food == brought_food
+        if pheromones:
+            assert np.array_equal(frame.pheromones, field)
+        else:
+            assert frame.pheromones is None
+    assert [frame.step for frame in reader] == [state[0] for state in states]
+    with pytest.raises(IndexError):
+        reader[len(states)]
@@ -0,0 +1,72 @@
+import json
+import asyncio
+from aco import aco
+from service import SimulationService
+
+def serve_and_call(tmp_path, client):
+    """
+    Runs a service with one worker on a Unix socket, calls
+    client(reader, writer) and returns what it returns.
+    """
+    path = str(tmp_path / 'service.sock')
+
+    async def main():
+        service = SimulationService(workers=1, max_pending=2)
+        await service.start(path)
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            result = await asyncio.wait_for(client(reader, writer), timeout=60)
+            writer.close()
+            return result
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+async def send(writer, message):
+    writer.write((json.dumps(message)+"\n").encode())
+    await writer.drain()
+
+async def receive_until(reader, types):
+    messages = []
+    while True:
+        messages.append(json.loads(await reader.readline()))
+        if messages[-1]['type'] in types:
+            return messages
+
+run_params = {'dimensions': [15, 15], 'no_ants': 8, 'no_food': 3, 'engine': 'vectorized'}
+
+def test_run_streams_progress_and_matches_aco_run(tmp_path):
+    async def client(reader, writer):
+        await send(writer, {'type': 'run', 'id': 'a', 'params': run_params, 'seed': 4, 'max_steps': 40, 'progress_every': 10})
+        return await receive_until(reader, ['result', 'error'])
+
+    messages = serve_and_call(tmp_path, client)
+    assert [message['type'] for message in messages] == ['accepted', 'started'] + ['progress']*4 + ['result']
+    assert [message['step'] for message in messages[2:6]] == [10, 20, 30, 40]
+    expected = aco(seed=4, **dict(run_params, dimensions=(15, 15))).run(max_steps=40)
+    result = messages[-1]['result']
+    assert (result['steps'], result['brought_food'], result['food_left']) == (expected.steps, expected.brought_food, expected.food_left)
+
+def test_malformed_requests_get_errors_and_runs_continue(tmp_path):
+    async def client(reader, writer):
+        replies = []
+        await send(writer, {'type': 'run', 'id': 'slow', 'params': dict(run_params, dimensions=[60, 60], no_ants=100),
+                            'seed': 1, 'max_steps': 400, 'progress_every': None})
+        replies += await receive_until(reader, ['started'])
+        writer.write(b"not json\n")
+        replies.append(json.loads(await reader.readline()))
+        for bad_id in [[1, 2], {'a': 1}]:
+            await send(writer, {'type': 'run', 'id': bad_id, 'params': run_params, 'seed': 1})
+            replies.append(json.loads(await reader.readline()))
+        await send(writer, {'type': 'cancel', 'id': 'missing'})
+        replies.append(json.loads(await reader.readline()))
+        await send(writer, {'type': 'run', 'id': 'bad', 'params': {'dimensions': [3, 3], 'no_ants': 20, 'no_food': 1}, 'seed': 1})
+        await send(writer, {'type': 'cancel', 'id': 'slow'})
+        replies += await receive_until(reader, ['cancelled'])
+        replies += await receive_until(reader, ['error'])
+        return replies
+
+    replies = serve_and_call(tmp_path, client)
+    assert [reply['type'] for reply in replies[2:6]] == ['error']*4
+    assert any(reply['type'] == 'cancelled' and reply['id'] == 'slow' for reply in replies)
+    assert replies[-1]['id'] == 'bad' and 'not enough cells' in replies[-1]['error']
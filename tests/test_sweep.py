@@ -0,0 +1,64 @@
+import json
+import pytest
+from sweep import Sweep, load_sweep
+
+spec = {'grid': {'no_ants': [5, 10], 'evaporation_coefficient': [0.02, 0.1]},
+        'base': {'dimensions': [12, 12], 'no_food': 3, 'engine': 'vectorized'},
+        'replicates': 2, 'seed': 3, 'max_steps': 60}
+
+timings = ['elapsed', 'completion_time', 'steps_per_second', 'ant_moves_per_second']
+
+def read_results(path):
+    """
+    Reads the complete records of a results file.
+    """
+    records = []
+    with open(path) as results_file:
+        for line in results_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+def outcome(result):
+    return {name: value for name, value in result.items() if name not in timings}
+
+def test_sweep_runs_every_task_once(tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    assert load_sweep(spec).run(output, workers=2, batch=2) == 8
+    records = read_results(output)
+    assert sorted(record['run_id'] for record in records) == sorted(task['run_id'] for task in load_sweep(spec).tasks())
+
+def test_resume_skips_completed_runs(tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    sweep = load_sweep(spec)
+    sweep.run(output, workers=1)
+    full = {record['run_id']: record['result'] for record in read_results(output)}
+
+    # Keep three runs and a line cut off mid-write
+    with open(output) as results_file:
+        lines = results_file.readlines()
+    with open(output, 'w') as results_file:
+        results_file.writelines(lines[:3])
+        results_file.write(lines[3][:20])
+
+    assert sweep.run(output, workers=1) == 5
+    records = read_results(output)
+    assert sorted(record['run_id'] for record in records) == sorted(full)
+    for record in records:
+        assert outcome(record['result']) == outcome(full[record['run_id']])
+
+def test_resume_refuses_a_different_specification(tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    load_sweep(spec).run(output, workers=1)
+    changed = load_sweep(dict(spec, seed=4))
+    with pytest.raises(ValueError):
+        changed.run(output, workers=1)
+    assert changed.run(output, workers=1, resume=False) == 8
+
+def test_run_seeds_do_not_depend_on_the_split():
+    tasks = {task['run_id']: task['seed'] for task in Sweep([{}, {}], replicates=3, seed=1).tasks()}
+    fewer = {task['run_id']: task['seed'] for task in Sweep([{}], replicates=2, seed=1).tasks()}
+    assert all(tasks[run_id] == seed for run_id, seed in fewer.items())
+    assert len(set(tasks.values())) == 6
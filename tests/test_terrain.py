@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import distance
+from aco import aco
+
+def walled_box(dimensions=(20, 20)):
+    """
+    Terrain with a closed box of walls, so the cells inside it cannot be
+    reached from a nest outside.
+    """
+    blocked = np.zeros(dimensions, dtype=bool)
+    blocked[2:9, 2] = blocked[2:9, 8] = True
+    blocked[2, 2:9] = blocked[8, 2:9] = True
+    return blocked
+
+@pytest.mark.parametrize('strategy', ['uniform', 'clustered', 'sequential'])
+def test_food_is_only_placed_where_ants_can_reach(strategy):
+    for seed in range(10):
+        simulation = aco((20, 20), 10, 10, terrain=walled_box(), food_placement=strategy, seed=seed)
+        xs, ys = simulation.food.locations[:, 0], simulation.food.locations[:, 1]
+        assert (simulation.home_distance[xs, ys] != distance.unreachable).all()
+        assert not simulation.terrain.blocked[xs, ys].any()
+
+def test_not_enough_reachable_cells():
+    # 24 walls and 25 cells inside them leave 351 reachable cells, one
+    # of them the nest
+    aco((20, 20), 5, 350, terrain=walled_box(), seed=0)
+    with pytest.raises(ValueError):
+        aco((20, 20), 5, 351, terrain=walled_box(), seed=0)
+
+@pytest.mark.parametrize('engine', ['reference', 'vectorized'])
+def test_walled_runs_finish_with_bfs_homing(engine):
+    blocked = np.zeros((20, 20), dtype=bool)
+    blocked[7, :] = True
+    blocked[7, 17] = False
+    simulation = aco((20, 20), 10, 4, engine=engine, terrain=blocked, seed=1)
+    assert simulation.home_metric == 'bfs'
+    result = simulation.run(max_steps=5000)
+    assert result.finished
+    assert simulation.brought_food == simulation.all_food
@@ -0,0 +1,30 @@
+import numpy as np
+from aco import aco
+from tiled import TiledSimulation
+from conftest import assert_same_state
+
+def test_one_tile_matches_aco_run():
+    simulation = aco((40, 30), 60, 8, engine='vectorized', seed=5)
+    expected = aco((40, 30), 60, 8, engine='vectorized', seed=5)
+    with TiledSimulation(simulation, (1, 1)) as tiled:
+        result = tiled.run(max_steps=400)
+    expected_result = expected.run(max_steps=400)
+    assert (result.steps, result.brought_food, result.finished) == (expected_result.steps, expected_result.brought_food, expected_result.finished)
+    assert_same_state(simulation, expected)
+    assert np.array_equal(simulation.food.active, expected.food.active)
+    assert simulation.rng.random() == expected.rng.random()
+
+def test_tiles_keep_food_and_grids_consistent():
+    simulation = aco((40, 30), 200, 12, engine='vectorized', seed=5)
+    with TiledSimulation(simulation, (3, 2)) as tiled:
+        for step in range(200):
+            tiled.increment()
+            if step % 50 == 0:
+                tiled.sync()
+                ant_grid, _ = simulation.get_object_grids()
+                assert np.array_equal(ant_grid, simulation.ant_grid)
+                assert tiled.brought_food + tiled.carried_food + tiled.food_left() == simulation.all_food
+        result = tiled.run(max_steps=3000)
+    assert result.finished
+    assert simulation.brought_food == simulation.all_food
+    simulation.check_object_grids()
@@ -0,0 +1,457 @@
+import time
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+import kernel
+from terrain import allowed_moves
+from aco import RunResult
+
+class SharedGrids:
+    def __init__(self, simulation):
+        """
+        Copies the grids of a simulation into shared memory, so tile
+        workers can read and write them without copying. Every grid
+        keeps its one cell border, so the cells just outside a tile (its
+        halo) are read straight from the neighbouring tiles.
+        :param simulation: aco object to copy
+        """
+        self.blocks = {}
+        self.arrays = {}
+        self.add('pheromones', simulation.pheromone_field.padded)
+        self.add('ants', simulation.padded_ant_grid)
+        self.add('food', simulation.padded_food_grid)
+        self.add('food_index', simulation.padded_food_index)
+        self.add('home', simulation.padded_home_grid)
+        self.add('nest_index', simulation.padded_nest_index)
+        self.add('home_distance', simulation.padded_home_distance)
+        if simulation.terrain != None:
+            self.add('passability', simulation.terrain.passability)
+            self.add('cost', simulation.terrain.padded_cost)
+        self.add('food_val', simulation.food.values)
+        # Taboo rows are addressed by ant index, so they never travel
+        # between processes with their ants
+        self.add('taboo', simulation.ants.taboo)
+
+    def add(self, name, array):
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.blocks[name] = block
+        self.arrays[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        self.arrays[name][:] = array
+
+    def spec(self):
+        """
+        Describes the shared blocks so worker processes can attach.
+        :return dict: Name to (block name, shape, dtype)
+        """
+        return {name: (self.blocks[name].name, array.shape, array.dtype.str) for name, array in self.arrays.items()}
+
+    def close(self):
+        """
+        Frees the shared memory.
+        """
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+def attach(spec):
+    """
+    Attaches to shared grids from a worker process.
+    :param spec:  Output of SharedGrids.spec
+    :return dict: Name to shared block
+    :return dict: Name to NumPy array
+    """
+    blocks, arrays = {}, {}
+    for name, (block_name, shape, dtype) in spec.items():
+        blocks[name] = shared_memory.SharedMemory(name=block_name)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+    return blocks, arrays
+
+class Tile:
+    def __init__(self, bounds, grids, config, seed):
+        """
+        The part of the grid owned by one worker process, and the ants
+        standing in it. A tile only ever writes to its own cells, so
+        workers never need locks: ants leaving the tile are handed to
+        the tile they move into, which adds them to its own cells.
+        :param bounds: (x0, x1, y0, y1) cells owned by the tile
+        :param grids:  Name to shared padded array
+        :param config: Simulation settings shared by every tile
+        :param seed:   Seed or generator for the tile
+        """
+        self.bounds = bounds
+        self.grids = grids
+        self.config = config
+        self.rng = np.random.default_rng(seed)
+        self.ants = None
+        self.pending = None
+
+    def inside(self, xs, ys):
+        x0, x1, y0, y1 = self.bounds
+        return (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+
+    def interior(self, name):
+        x0, x1, y0, y1 = self.bounds
+        return self.grids[name][x0+1:x1+1, y0+1:y1+1]
+
+    def move(self, any_food):
+        """
+        Chooses a move for every ant on the tile from the state at the
+        start of the tick. Nothing is written, so every tile can do this
+        at once.
+        :param any_food: If any food source is left anywhere on the grid
+        :return dict:    Ants leaving the tile
+        """
+        ants, grids, config = self.ants, self.grids, self.config
+
+        # Only ants with a taboo still counting down have rows to update.
+        # taboo_left is the largest count in each ant's row.
+        shared_taboo = grids['taboo']
+        cooling = np.flatnonzero(ants['taboo_left'] > 0)
+        if len(cooling) > 0:
+            rows = shared_taboo[ants['index'][cooling]]
+            np.subtract(rows, 1, out=rows, where=rows > 0)
+            shared_taboo[ants['index'][cooling]] = rows
+            ants['taboo_left'][cooling] -= 1
+
+        locations = ants['locations']
+        xs, ys = kernel.neighbours(locations)
+        px, py = xs+1, ys+1
+
+        food_index = grids['food_index'][px, py]
+        if shared_taboo.shape[1] > 0:
+            rows = ants['index'][:, None]
+            taboo = (shared_taboo[rows, np.maximum(food_index, 0)] > 0) & (food_index >= 0)
+        else:
+            taboo = np.zeros(xs.shape, dtype=bool)
+
+        home_distance = grids['home_distance']
+        centre = home_distance[locations[:, 0]+1, locations[:, 1]+1]
+        homing = (ants['carry'] == ants['capacity']) | (not any_food)
+
+        weights = kernel.movement_weights(ants['carry'], ants['capacity'], grids['pheromones'][px, py],
+                                          grids['food'][px, py], grids['ants'][px, py] > 0, grids['home'][px, py],
+                                          taboo, home_distance[px, py] <= centre[:, None], homing)
+        if 'passability' in grids:
+            kernel.apply_terrain(weights, allowed_moves(grids['passability'], locations[:, 0], locations[:, 1]), grids['cost'][px, py])
+        choices, moving = kernel.sample_moves(weights, self.rng)
+        rows = np.arange(len(locations))
+        new_xs, new_ys = xs[rows, choices], ys[rows, choices]
+
+        leaving = moving & ~self.inside(new_xs, new_ys)
+        self.pending = (moving, leaving, new_xs, new_ys)
+        emigrants = {key: value[leaving] for key, value in ants.items()}
+        emigrants['locations'] = np.stack([new_xs[leaving], new_ys[leaving]], axis=1).astype(np.int32)
+        return emigrants
+
+    def apply(self, immigrants):
+        """
+        Applies the moves chosen by move, adds ants arriving from other
+        tiles, then handles pickups, drop-offs and pheromones on the
+        tile's own cells, in the same order as aco.move_ants_batched.
+        :param immigrants: Ants moving onto the tile, as returned by move
+        :return np.array:  Food brought home on the tile, for each nest
+        :return int:       Food carried by ants on the tile
+        """
+        ants, grids, config = self.ants, self.grids, self.config
+        moving, leaving, new_xs, new_ys = self.pending
+        self.pending = None
+
+        padded_ants = grids['ants']
+        locations = ants['locations']
+        movers = np.flatnonzero(moving)
+        np.subtract.at(padded_ants, (locations[movers, 0]+1, locations[movers, 1]+1), 1)
+
+        staying = np.flatnonzero(moving & ~leaving)
+        locations[staying, 0] = new_xs[staying]
+        locations[staying, 1] = new_ys[staying]
+        moved = moving[~leaving]
+        ants = {key: np.concatenate([value[~leaving], immigrants[key]]) for key, value in ants.items()}
+        moved = np.concatenate([moved, np.ones(len(immigrants['index']), dtype=bool)])
+
+        # Pickups happen in global ant order, as in a single process
+        order = np.argsort(ants['index'], kind='stable')
+        ants = {key: value[order] for key, value in ants.items()}
+        self.ants = ants
+        movers = np.flatnonzero(moved[order])
+        locations, carry = ants['locations'], ants['carry']
+        xs, ys = locations[movers, 0], locations[movers, 1]
+        np.add.at(padded_ants, (xs+1, ys+1), 1)
+
+        food_grid, food_index, food_val = self.interior('food'), self.interior('food_index'), grids['food_val']
+        x0, _, y0, _ = self.bounds
+        on_food = food_grid[xs-x0, ys-y0] > 0
+        for i, x, y in zip(movers[on_food].tolist(), xs[on_food].tolist(), ys[on_food].tolist()):
+            index = food_index[x-x0, y-y0]
+            if index < 0:
+                continue
+            grids['taboo'][ants['index'][i], index] = config['taboo_cooldown']
+            ants['taboo_left'][i] = config['taboo_cooldown']
+            carry[i] += 1
+            if food_val[index] > 1:
+                if config['food_deplete']:
+                    food_val[index] -= 1
+            else:
+                food_val[index] = 0
+                food_grid[x-x0, y-y0] -= 100
+                food_index[x-x0, y-y0] = -1
+
+        at_home = movers[self.interior('home')[xs-x0, ys-y0] & ~on_food]
+        delivered = np.zeros(config['nests'], dtype=np.int64)
+        np.add.at(delivered, self.interior('nest_index')[locations[at_home, 0]-x0, locations[at_home, 1]-y0], carry[at_home])
+        carry[at_home] = 0
+
+        pheromones = self.interior('pheromones')
+        np.multiply(pheromones, 1 - config['evaporation_coefficient'], out=pheromones)
+        np.maximum(pheromones, config['floor'], out=pheromones)
+        full = carry == ants['capacity']
+        np.add.at(grids['pheromones'], (locations[full, 0]+1, locations[full, 1]+1), config['deposit'])
+
+        return delivered, int(carry.sum())
+
+def run_tile(connection, bounds, spec, config, seed):
+    """
+    Worker process loop, answering commands from a TiledSimulation.
+    :param connection: Pipe to the parent process
+    :param bounds:     Cells owned by the tile
+    :param spec:       Shared grids to attach to
+    :param config:     Simulation settings
+    :param seed:       Seed for the tile's generator
+    """
+    blocks, grids = attach(spec)
+    tile = Tile(bounds, grids, config, seed)
+    try:
+        while True:
+            command, payload = connection.recv()
+            if command == 'ants':
+                tile.ants = payload
+                connection.send(None)
+            elif command == 'move':
+                connection.send(tile.move(payload))
+            elif command == 'apply':
+                connection.send(tile.apply(payload))
+            elif command == 'get':
+                connection.send((tile.ants, tile.rng.bit_generator.state))
+            elif command == 'end':
+                break
+    finally:
+        grids.clear()
+        for block in blocks.values():
+            block.close()
+
+def tile_edges(size, parts):
+    """
+    Splits a grid axis into nearly equal parts.
+    :param size:      Axis length
+    :param parts:     Number of parts
+    :return np.array: (parts+1,) part boundaries
+    """
+    return np.linspace(0, size, parts+1).astype(int)
+
+class TiledSimulation:
+    def __init__(self, simulation, tiles=(2, 2)):
+        """
+        Runs one simulation split into tiles, each stepped by its own
+        worker process. The grids live in shared memory, ants move
+        between workers when they cross a tile edge, and food and home
+        bookkeeping are shared, so the whole grid stays consistent.
+        Steps follow the vectorized engine. With more than one tile, each
+        tile draws from its own generator, so runs match other runs with
+        the same seed and tiling rather than single process runs. A 1x1
+        tiling uses the simulation's generator and matches aco.run.
+        The simulation object is only brought up to date by sync.
+        Ant taboo counts are held once in shared memory, next to the
+        simulation's own copy, so they need (ants x food) bytes twice.
+        :param simulation: aco object using the vectorized engine
+        :param tiles:      Number of tiles along each axis
+        """
+        if simulation.engine != 'vectorized':
+            raise ValueError("tiled simulations need the vectorized engine")
+        if simulation.resolve_conflicts:
+            raise ValueError("tiled simulations do not support resolve_conflicts")
+        if not hasattr(simulation.pheromone_field, 'padded'):
+            raise ValueError("tiled simulations need the dense pheromone backend")
+
+        self.simulation = simulation
+        self.row_edges = tile_edges(simulation.dimensions[0], tiles[0])
+        self.column_edges = tile_edges(simulation.dimensions[1], tiles[1])
+        self.tiles = tiles
+        self.steps = simulation.steps
+        self.brought_food = simulation.brought_food
+        self.nest_food = simulation.nest_food.copy()
+        self.carried_food = int(simulation.ants.carry.sum())
+        self.grids = SharedGrids(simulation)
+
+        field = simulation.pheromone_field
+        config = {
+            'nests': len(simulation.nests),
+            'food_deplete': simulation.food_deplete,
+            'taboo_cooldown': simulation.ants.taboo_cooldown,
+            'evaporation_coefficient': field.evaporation_coefficient,
+            'deposit': field.deposit_amount,
+            'floor': field.floor
+        }
+
+        # Tile generators are seeded from the simulation's, so a restored
+        # checkpoint tiles the same way. A single tile continues the
+        # simulation's own generator.
+        if tiles[0]*tiles[1] == 1:
+            seeds = [simulation.rng]
+        else:
+            seeds = np.random.SeedSequence(int(simulation.rng.integers(2**63))).spawn(tiles[0]*tiles[1])
+        context = multiprocessing.get_context()
+        self.connections = []
+        self.processes = []
+        spec = self.grids.spec()
+        for i in range(tiles[0]):
+            for j in range(tiles[1]):
+                bounds = (int(self.row_edges[i]), int(self.row_edges[i+1]), int(self.column_edges[j]), int(self.column_edges[j+1]))
+                parent_connection, child_connection = context.Pipe()
+                process = context.Process(target=run_tile, args=(child_connection, bounds, spec, config, seeds[len(self.processes)]), daemon=True)
+                process.start()
+                self.connections.append(parent_connection)
+                self.processes.append(process)
+
+        ants = simulation.ants
+        all_ants = {
+            'index': np.arange(len(ants), dtype=np.int64),
+            'locations': ants.locations,
+            'carry': ants.carry,
+            'capacity': ants.capacity,
+            'taboo_left': ants.taboo.max(axis=1, initial=0)
+        }
+        for connection, ants_on_tile in zip(self.connections, self.split(all_ants)):
+            connection.send(('ants', ants_on_tile))
+        for connection in self.connections:
+            connection.recv()
+
+    def owners(self, locations):
+        """
+        Finds the tile owning each location.
+        :param locations: (n, 2) array of coordinates
+        :return np.array: (n,) tile number
+        """
+        rows = np.searchsorted(self.row_edges, locations[:, 0], side='right') - 1
+        columns = np.searchsorted(self.column_edges, locations[:, 1], side='right') - 1
+        return rows*self.tiles[1] + columns
+
+    def split(self, ants):
+        """
+        Splits ant arrays by the tile they are on.
+        :param ants:   Dictionary of ant arrays
+        :return [dict]: Ant arrays for each tile
+        """
+        owners = self.owners(ants['locations'])
+        return [{key: value[owners == tile] for key, value in ants.items()} for tile in range(len(self.connections))]
+
+    def increment(self):
+        """
+        Increments the simulation on every tile.
+        :return int: Total food left
+        """
+        any_food = bool((self.grids.arrays['food_val'] > 0).any())
+        for connection in self.connections:
+            connection.send(('move', any_food))
+        emigrants = [connection.recv() for connection in self.connections]
+
+        # Every tile has chosen its moves before any tile changes the grids
+        arriving = {key: np.concatenate([ants[key] for ants in emigrants]) for key in emigrants[0]}
+        for connection, immigrants in zip(self.connections, self.split(arriving)):
+            connection.send(('apply', immigrants))
+        self.carried_food = 0
+        for connection in self.connections:
+            delivered, carried = connection.recv()
+            self.nest_food += delivered
+            self.brought_food += int(delivered.sum())
+            self.carried_food += carried
+
+        self.steps += 1
+        return self.food_left()
+
+    def food_left(self):
+        """
+        Sums the food left in every food source.
+        :return int: Total food left
+        """
+        return int(self.grids.arrays['food_val'].sum())
+
+    def is_finished(self):
+        """
+        Checks if all food is collected.
+        :return bool: If all food is collected
+        """
+        no_food = not (self.grids.arrays['food_val'] > 0).any()
+        return (self.simulation.all_food == self.brought_food) or (self.carried_food == 0 and no_food)
+
+    def run(self, max_steps=None, until_finished=True):
+        """
+        Runs the simulation, as aco.run.
+        :param max_steps:      Maximum number of steps, or None for no limit
+        :param until_finished: Stops early once all food is collected
+        :return RunResult:     Summary of the run
+        """
+        if max_steps == None and not until_finished:
+            raise ValueError("run needs max_steps when until_finished is False")
+
+        steps = 0
+        start = time.perf_counter()
+        while max_steps == None or steps < max_steps:
+            if until_finished and self.is_finished():
+                break
+            self.increment()
+            steps += 1
+        elapsed = time.perf_counter() - start
+        return RunResult(steps, len(self.simulation.ants), self.brought_food, self.food_left(), self.is_finished(), elapsed, self.simulation.seed)
+
+    def sync(self):
+        """
+        Copies the tiled state back into the simulation object, for
+        drawing, recording or saving checkpoints.
+        :return aco: Updated simulation
+        """
+        simulation = self.simulation
+        for connection in self.connections:
+            connection.send(('get', None))
+        replies = [connection.recv() for connection in self.connections]
+        ants = {key: np.concatenate([tile_ants[key] for tile_ants, _ in replies]) for key in replies[0][0]}
+        order = np.argsort(ants['index'])
+        simulation.ants.locations[:] = ants['locations'][order]
+        simulation.ants.carry[:] = ants['carry'][order]
+        simulation.ants.capacity[:] = ants['capacity'][order]
+        if len(replies) == 1:
+            simulation.rng.bit_generator.state = replies[0][1]
+
+        arrays = self.grids.arrays
+        simulation.ants.taboo[:] = arrays['taboo']
+        simulation.pheromone_field.padded[:] = arrays['pheromones']
+        simulation.padded_ant_grid[:] = arrays['ants']
+        simulation.food.update(arrays['food_val'])
+
+        simulation.steps = self.steps
+        simulation.brought_food = self.brought_food
+        simulation.carried_food = self.carried_food
+        simulation.nest_food[:] = self.nest_food
+        return simulation
+
+    def close(self):
+        """
+        Stops the worker processes and frees the shared memory. The
+        simulation object is synced first.
+        """
+        if len(self.processes) == 0:
+            return
+        self.sync()
+        for connection in self.connections:
+            connection.send(('end', None))
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        self.connections = []
+        self.grids.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
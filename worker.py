@@ -0,0 +1,138 @@
+import time
+import queue
+import threading
+import numpy as np
+
+class Snapshot:
+    def __init__(self, simulation, total_food=None):
+        """
+        Read-only copy of the parts of a simulation needed for display.
+        :param simulation: aco object to copy
+        :param total_food: Food left, if already known
+        """
+        ants = simulation.ants
+        food = simulation.food
+        active = food.active
+
+        self.steps = simulation.steps
+        self.pheromones = frozen(simulation.pheromones)
+        self.ant_locations = frozen(ants.locations)
+        self.ant_colour_index = frozen(ants.colour_index)
+        self.colours = tuple(ants.colours)
+        self.home_grid = frozen(simulation.home_grid)
+        self.blocked = simulation.terrain.blocked if simulation.terrain != None else None
+        self.food_locations = frozen(food.locations[active].astype(np.intp))
+        self.food_fill = frozen(food.values[active]/food.capacity[active])
+        self.food_deplete = simulation.food_deplete
+        self.total_food = total_food if total_food != None else simulation.food_left()
+        self.brought_food = simulation.brought_food
+        self.finished = simulation.is_finished()
+
+def frozen(array):
+    """
+    Copies an array and marks the copy read-only.
+    :param array:     Array to copy
+    :return np.array: Read-only copy
+    """
+    array = np.array(array)
+    array.setflags(write=False)
+    return array
+
+class SimulationWorker(threading.Thread):
+    def __init__(self, simulation, delay=0.0, snapshot_rate=60, max_snapshots=2):
+        """
+        Steps a simulation on a background thread, publishing snapshots
+        through a bounded queue. Starts paused.
+        :param simulation:    aco object to run
+        :param delay:         Seconds to wait between steps
+        :param snapshot_rate: Maximum snapshots published per second
+        :param max_snapshots: Size of the snapshot queue
+        """
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        self.delay = delay
+        self.snapshot_interval = 1/snapshot_rate
+        self.controls = queue.Queue()
+        self.snapshots = queue.Queue(maxsize=max_snapshots)
+        self.running = False
+        self.ended = False
+
+    def run(self):
+        """
+        Worker loop. Handles control messages, steps the simulation and
+        publishes snapshots until the simulation finishes or is ended.
+        """
+        self.publish(Snapshot(self.simulation))
+        last_publish = time.perf_counter()
+
+        while not self.ended:
+            # Block while paused, otherwise only wait for the step delay
+            try:
+                if not self.running:
+                    self.handle(self.controls.get())
+                    continue
+                elif self.delay > 0:
+                    self.handle(self.controls.get(timeout=self.delay))
+                    continue
+                else:
+                    self.handle(self.controls.get_nowait())
+                    continue
+            except queue.Empty:
+                pass
+
+            total_food = self.simulation.increment()
+            finished = self.simulation.is_finished()
+            if finished or time.perf_counter() - last_publish >= self.snapshot_interval:
+                self.publish(Snapshot(self.simulation, total_food))
+                last_publish = time.perf_counter()
+            if finished:
+                self.running = False
+                break
+
+    def handle(self, message):
+        """
+        Applies a control message.
+        :param message: 'resume', 'pause' or 'end'
+        """
+        if message == 'resume':
+            self.running = True
+        elif message == 'pause':
+            self.running = False
+        elif message == 'end':
+            self.ended = True
+
+    def publish(self, snapshot):
+        """
+        Adds a snapshot to the queue, dropping the oldest if it is full.
+        :param snapshot: Snapshot to publish
+        """
+        while True:
+            try:
+                self.snapshots.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.snapshots.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def latest(self):
+        """
+        Takes the most recent snapshot, discarding older ones.
+        :return Snapshot: Latest snapshot, or None if there is no new one
+        """
+        snapshot = None
+        while True:
+            try:
+                snapshot = self.snapshots.get_nowait()
+            except queue.Empty:
+                return snapshot
+
+    def resume(self):
+        self.controls.put('resume')
+
+    def pause(self):
+        self.controls.put('pause')
+
+    def end(self):
+        self.controls.put('end')